@@ -1,24 +1,78 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, abort
 from functools import wraps
+import click
 from datetime import datetime
 import os
+import threading
+import time
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here-change-in-production'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Optional read replica for read-only routes, e.g. REPLICA_DATABASE_URI=sqlite:///replica.db.
+# REPLICA_SYNC_INTERVAL copies the primary into a local SQLite replica every N seconds (testing).
+app.config['REPLICA_DATABASE_URI'] = os.environ.get('REPLICA_DATABASE_URI')
+app.config['REPLICA_MAX_LAG'] = float(os.environ.get('REPLICA_MAX_LAG', 5))
+app.config['REPLICA_SYNC_INTERVAL'] = float(os.environ.get('REPLICA_SYNC_INTERVAL', 0))
+
+# Optional horizontal sharding of attempt data by user id range, e.g.
+# SHARD_DATABASE_URIS=sqlite:///shard0.db,sqlite:///shard1.db with SHARD_USER_RANGE users per shard
+app.config['SHARD_DATABASE_URIS'] = [uri for uri in os.environ.get('SHARD_DATABASE_URIS', '').split(',') if uri]
+app.config['SHARD_USER_RANGE'] = int(os.environ.get('SHARD_USER_RANGE', 10000))
+
+# Scores older than this many days are folded into per-quiz rollups and
+# moved to the archive table every hour (0 keeps every score in the hot table)
+app.config['SCORE_RETENTION_DAYS'] = int(os.environ.get('SCORE_RETENTION_DAYS', 0))
+
 # Import after app creation
-from models import db, User, Subject, Chapter, Quiz, Question, Score
+from models import db, User, Subject, Chapter, Quiz, Question, QuizAttempt
 from utils.ai_generator import generate_mcq_questions
-from utils.charts import generate_performance_data
+from utils.charts import (generate_performance_data, count_attempts, clamp_trend_points,
+                          DEFAULT_TREND_GRANULARITY, DEFAULT_TREND_POINTS)
+from utils.leaderboard import get_leaderboard, invalidate_leaderboard
+from utils.export import build_export_query, stream_scores, EXPORT_FORMATS
+from utils.schema import upgrade_schema
+from utils.search import ensure_search_index, search_questions as run_question_search
+from utils.read_models import get_score_view, get_recent_scores, get_subject_cards, get_quiz_view, get_question_view
+from utils.dedup import (find_duplicates, index_question, unindex_question, unindex_questions,
+                         start_index_builder, build_duplicate_report, DUPLICATE_THRESHOLD)
+from utils.attempts import (start_attempt, remaining_seconds, is_expired, answers_from_form,
+                            submit_attempt, start_expiry_worker, recent_submission, remember_submission)
+from utils.replica import configure_replica, replica_reads, remember_writes, start_replication
+from utils.sharding import (configure_shards, init_shards, pin_request_to_shard, unpin_request,
+                            sync_after_request, sync_reference_data, sharding_enabled)
+from utils.fragments import cached_fragment, bump_version, enable_bytecode_cache, CATALOG
+from utils.quiz_cache import (get_quiz_content, get_questions_html, is_warm, invalidate_quiz_content,
+                              record_first_request, warm_upcoming_quizzes, warm_quiz, start_warm_worker,
+                              WARM_LOOKAHEAD_DAYS)
+from utils.autosave import (get_attempt_context, parse_answers, record_answers, saved_answers,
+                            start_autosave_worker, AUTOSAVE_CLIENT_INTERVAL, VALID_OPTIONS)
+from utils.adaptive import (next_question, question_count, attempt_answers, record_outcome,
+                            finish_adaptive_attempt)
+from utils.archive import archive_scores, start_archive_worker
 
 # Initialize database
+configure_replica(app)
+configure_shards(app)
 db.init_app(app)
+app.after_request(remember_writes)
+
+# Students' requests run against the shard holding their attempts; content
+# edited on the primary is copied to every shard
+app.before_request(pin_request_to_shard)
+app.teardown_request(unpin_request)
+app.after_request(sync_after_request)
+
+# Compiled templates are reused across restarts and workers
+enable_bytecode_cache(app)
 
 # Create tables and admin user
 with app.app_context():
     db.create_all()
+    upgrade_schema(db)
+    ensure_search_index(db)
     # Create admin if not exists
     admin = User.query.filter_by(username='admin@quiz.com').first()
     if not admin:
@@ -34,6 +88,46 @@ with app.app_context():
         db.session.add(admin)
         db.session.commit()
         print("Admin user created: admin@quiz.com / admin123")
+    init_shards()
+
+_workers_started = False
+_workers_lock = threading.Lock()
+
+def start_workers():
+    """
+    Start the background workers, once per serving process
+
+    Not run at import, so CLI commands and the debug reloader's parent
+    process do not auto-submit attempts or warm caches of their own.
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+
+    # Auto-submit timed attempts whose deadline has passed, and persist autosaved answers
+    start_expiry_worker(app)
+    start_autosave_worker(app)
+
+    # Preload quizzes scheduled for today and tomorrow before students arrive
+    start_warm_worker(app)
+
+    # Heartbeat (and optional local copy) for the read replica
+    start_replication(app)
+
+    # Move scores past the retention horizon out of the hot table
+    start_archive_worker(app)
+
+    # Load the question bank's duplicate index before the first add or edit needs it
+    start_index_builder(app)
+
+# WSGI servers import the app without running __main__, so their workers
+# start with the first request each process serves
+@app.before_request
+def start_workers_on_first_request():
+    if not _workers_started:
+        start_workers()
 
 # Login required decorator
 def login_required(f):
@@ -59,6 +153,82 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def flash_duplicates(duplicates):
+    ids = ', '.join(f'#{question_id} ({int(score * 100)}%)' for question_id, score in duplicates[:5])
+    flash(f'Possible near-duplicate of existing questions: {ids}', 'warning')
+
+def redirect_to_submitted(attempt):
+    """Send a repeat submission to the result the attempt already has"""
+    remember_submission(attempt.token, attempt.score_id)
+    if attempt.auto_submitted:
+        flash('Time was up, so your quiz was submitted automatically', 'warning')
+    else:
+        flash('This quiz attempt was already submitted', 'info')
+    return redirect(url_for('view_result', score_id=attempt.score_id))
+
+def finish_adaptive(attempt, now=None, auto_submitted=False):
+    """Grade an adaptive attempt and send the student to the result"""
+    score = finish_adaptive_attempt(attempt, now, auto_submitted)
+    if score is None:
+        # The expiry worker got there first
+        return redirect_to_submitted(QuizAttempt.query.get(attempt.id))
+    if auto_submitted:
+        flash('Time was up, so your quiz was submitted automatically', 'warning')
+    else:
+        flash(f'Quiz submitted! Score: {score.total_score} ({score.accuracy_percentage:.2f}%)', 'success')
+    return redirect(url_for('view_result', score_id=score.id))
+
+@app.cli.command('cache-latency')
+@click.option('--days', default=WARM_LOOKAHEAD_DAYS, show_default=True,
+              help='Probe quizzes dated from today through this many days ahead')
+@click.option('--quiz-id', type=int, help='Probe a single quiz instead')
+def cache_latency(days, quiz_id):
+    """Report how long upcoming quizzes take to load cold and from the cache.
+
+    The command runs in its own process, so it does not warm a running server;
+    serving processes warm upcoming quizzes themselves.
+    """
+    if quiz_id is not None:
+        results = [(quiz_id, *warm_quiz(quiz_id))]
+    else:
+        results = warm_upcoming_quizzes(days=days, force=True)
+    for probed_quiz_id, cold, warm in results:
+        print(f'quiz {probed_quiz_id}: {cold * 1e3:.2f}ms cold, {warm * 1e3:.3f}ms cached')
+    print(f'{len(results)} quizzes probed')
+
+@app.cli.command('archive-scores')
+@click.option('--days', type=int, default=lambda: app.config['SCORE_RETENTION_DAYS'] or 365,
+              show_default='SCORE_RETENTION_DAYS, or 365',
+              help='Archive scores older than this many days')
+def archive_old_scores(days):
+    """Fold old scores into per-quiz rollups and move them to the archive table."""
+    started = time.perf_counter()
+    archived = archive_scores(days)
+    print(f'{archived} scores older than {days} days archived in {time.perf_counter() - started:.2f}s')
+
+@app.cli.command('dedup-report')
+@click.option('--threshold', default=DUPLICATE_THRESHOLD, show_default=True,
+              help='Minimum estimated similarity for two questions to count as duplicates')
+def dedup_report(threshold):
+    """Print clusters of near-duplicate questions across the whole bank."""
+    groups = build_duplicate_report(threshold)
+    for group in groups:
+        questions = Question.query.filter(Question.id.in_(group)).all()
+        print(f'{len(group)} near-duplicates:')
+        for question in questions:
+            print(f'  #{question.id} (quiz {question.quiz_id}): {question.question_statement}')
+    print(f'{len(groups)} duplicate clusters, {sum(len(g) for g in groups)} questions')
+
+@app.cli.command('sync-shards')
+def sync_shards():
+    """Recopy every reference row (users, subjects, chapters, quizzes, questions) to the shards."""
+    if not sharding_enabled():
+        print('Sharding is not enabled (set SHARD_DATABASE_URIS)')
+        return
+    started = time.perf_counter()
+    synced = sync_reference_data(full=True)
+    print(f'{synced} reference rows synced in {time.perf_counter() - started:.2f}s')
+
 # Routes
 @app.route('/')
 def index():
@@ -133,11 +303,12 @@ def logout():
 # Admin Routes
 @app.route('/admin/dashboard')
 @admin_required
+@replica_reads
 def admin_dashboard():
     users = User.query.filter_by(is_admin=False).all()
     subjects = Subject.query.all()
     quizzes = Quiz.query.all()
-    total_attempts = Score.query.count()
+    total_attempts = count_attempts()
     
     return render_template('admin_dashboard.html', 
                          users=users, 
@@ -145,6 +316,39 @@ def admin_dashboard():
                          quizzes=quizzes,
                          total_attempts=total_attempts)
 
+# Score Export
+@app.route('/admin/export/scores')
+@admin_required
+@replica_reads
+def export_scores():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Unsupported export format', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    
+    try:
+        start_date = request.args.get('start')
+        end_date = request.args.get('end')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    
+    query = build_export_query(
+        start_date=start_date,
+        end_date=end_date,
+        subject_id=request.args.get('subject_id', type=int),
+        quiz_id=request.args.get('quiz_id', type=int)
+    )
+    
+    filename = f"scores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(stream_scores(query, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # Subject Management
 @app.route('/admin/subjects')
 @admin_required
@@ -162,6 +366,7 @@ def add_subject():
         subject = Subject(name=name, description=description)
         db.session.add(subject)
         db.session.commit()
+        bump_version(CATALOG)
         
         flash('Subject added successfully', 'success')
         return redirect(url_for('manage_subjects'))
@@ -177,6 +382,8 @@ def edit_subject(id):
         subject.name = request.form.get('name')
         subject.description = request.form.get('description')
         db.session.commit()
+        invalidate_quiz_content()
+        bump_version(CATALOG)
         
         flash('Subject updated successfully', 'success')
         return redirect(url_for('manage_subjects'))
@@ -187,8 +394,16 @@ def edit_subject(id):
 @admin_required
 def delete_subject(id):
     subject = Subject.query.get_or_404(id)
+    # Collected before the cascade removes them, so the duplicate index is not rebuilt
+    question_ids = db.session.scalars(
+        db.select(Question.id).join(Quiz).join(Chapter).where(Chapter.subject_id == id)
+    ).all()
     db.session.delete(subject)
     db.session.commit()
+    invalidate_leaderboard()
+    unindex_questions(question_ids)
+    invalidate_quiz_content()
+    bump_version(CATALOG)
     
     flash('Subject deleted successfully', 'success')
     return redirect(url_for('manage_subjects'))
@@ -213,6 +428,7 @@ def add_chapter():
         chapter = Chapter(subject_id=subject_id, name=name, description=description)
         db.session.add(chapter)
         db.session.commit()
+        bump_version(CATALOG)
         
         flash('Chapter added successfully', 'success')
         return redirect(url_for('manage_chapters'))
@@ -230,6 +446,8 @@ def edit_chapter(id):
         chapter.name = request.form.get('name')
         chapter.description = request.form.get('description')
         db.session.commit()
+        invalidate_quiz_content()
+        bump_version(CATALOG)
         
         flash('Chapter updated successfully', 'success')
         return redirect(url_for('manage_chapters'))
@@ -240,8 +458,15 @@ def edit_chapter(id):
 @admin_required
 def delete_chapter(id):
     chapter = Chapter.query.get_or_404(id)
+    question_ids = db.session.scalars(
+        db.select(Question.id).join(Quiz).where(Quiz.chapter_id == id)
+    ).all()
     db.session.delete(chapter)
     db.session.commit()
+    invalidate_leaderboard()
+    unindex_questions(question_ids)
+    invalidate_quiz_content()
+    bump_version(CATALOG)
     
     flash('Chapter deleted successfully', 'success')
     return redirect(url_for('manage_chapters'))
@@ -290,6 +515,7 @@ def edit_quiz(id):
         quiz.time_duration = request.form.get('time_duration')
         quiz.remarks = request.form.get('remarks')
         db.session.commit()
+        invalidate_quiz_content(id)
         
         flash('Quiz updated successfully', 'success')
         return redirect(url_for('manage_quizzes'))
@@ -300,8 +526,12 @@ def edit_quiz(id):
 @admin_required
 def delete_quiz(id):
     quiz = Quiz.query.get_or_404(id)
+    question_ids = db.session.scalars(db.select(Question.id).where(Question.quiz_id == id)).all()
     db.session.delete(quiz)
     db.session.commit()
+    invalidate_leaderboard(id)
+    unindex_questions(question_ids)
+    invalidate_quiz_content(id)
     
     flash('Quiz deleted successfully', 'success')
     return redirect(url_for('manage_quizzes'))
@@ -329,10 +559,18 @@ def add_question(quiz_id):
             option4=request.form.get('option4'),
             correct_option=int(request.form.get('correct_option'))
         )
+        duplicates = find_duplicates(
+            question.question_statement,
+            [question.option1, question.option2, question.option3, question.option4]
+        )
         db.session.add(question)
         db.session.commit()
+        index_question(question)
+        invalidate_quiz_content(quiz_id)
         
         flash('Question added successfully', 'success')
+        if duplicates:
+            flash_duplicates(duplicates)
         return redirect(url_for('manage_questions', quiz_id=quiz_id))
     
     return render_template('add_question.html', quiz=quiz)
@@ -350,8 +588,17 @@ def edit_question(id):
         question.option4 = request.form.get('option4')
         question.correct_option = int(request.form.get('correct_option'))
         db.session.commit()
+        index_question(question)
+        invalidate_quiz_content(question.quiz_id)
         
         flash('Question updated successfully', 'success')
+        duplicates = find_duplicates(
+            question.question_statement,
+            [question.option1, question.option2, question.option3, question.option4],
+            exclude_id=question.id
+        )
+        if duplicates:
+            flash_duplicates(duplicates)
         return redirect(url_for('manage_questions', quiz_id=question.quiz_id))
     
     return render_template('edit_question.html', question=question)
@@ -363,10 +610,19 @@ def delete_question(id):
     quiz_id = question.quiz_id
     db.session.delete(question)
     db.session.commit()
+    unindex_question(id)
+    invalidate_quiz_content(quiz_id)
     
     flash('Question deleted successfully', 'success')
     return redirect(url_for('manage_questions', quiz_id=quiz_id))
 
+@app.route('/admin/questions/search')
+@admin_required
+@replica_reads
+def search_questions():
+    search = run_question_search(request.args.get('q', ''), request.args.get('page', 1, type=int))
+    return render_template('search_questions.html', search=search)
+
 # AI Question Generation
 @app.route('/admin/quiz/<int:quiz_id>/generate-ai', methods=['GET', 'POST'])
 @admin_required
@@ -379,6 +635,7 @@ def generate_ai_questions(quiz_id):
         
         questions = generate_mcq_questions(keywords, num_questions)
         
+        new_questions = []
         for q in questions:
             question = Question(
                 quiz_id=quiz_id,
@@ -390,9 +647,23 @@ def generate_ai_questions(quiz_id):
                 correct_option=q['correct']
             )
             db.session.add(question)
+            new_questions.append(question)
         
         db.session.commit()
+        for question in new_questions:
+            index_question(question)
+        invalidate_quiz_content(quiz_id)
+        
+        # Checked after indexing so duplicates within the batch are caught too
+        duplicate_count = sum(1 for question in new_questions if find_duplicates(
+            question.question_statement,
+            [question.option1, question.option2, question.option3, question.option4],
+            exclude_id=question.id
+        ))
+        
         flash(f'{num_questions} AI-generated questions added successfully', 'success')
+        if duplicate_count:
+            flash(f'{duplicate_count} of them look like near-duplicates of existing questions', 'warning')
         return redirect(url_for('manage_questions', quiz_id=quiz_id))
     
     return render_template('generate_ai_questions.html', quiz=quiz)
@@ -402,12 +673,14 @@ def generate_ai_questions(quiz_id):
 @login_required
 def user_dashboard():
     user = User.query.get(session['user_id'])
-    subjects = Subject.query.all()
-    recent_scores = Score.query.filter_by(user_id=user.id).order_by(Score.timestamp_of_attempt.desc()).limit(5).all()
+    recent_scores = get_recent_scores(user.id, limit=5)
+    # The subject grid is the same for every student
+    subject_cards = cached_fragment('subject_cards.html', (CATALOG,),
+                                    lambda: {'subjects': get_subject_cards()})
     
     return render_template('user_dashboard.html', 
                          user=user, 
-                         subjects=subjects,
+                         subject_cards=subject_cards,
                          recent_scores=recent_scores)
 
 @app.route('/user/subject/<int:subject_id>')
@@ -427,86 +700,215 @@ def view_chapter(chapter_id):
 @app.route('/user/quiz/<int:quiz_id>/start')
 @login_required
 def start_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    
-    if not questions:
+    started = time.perf_counter()
+    warmed = is_warm(quiz_id)
+    content = get_quiz_content(quiz_id)
+    if content is None:
+        abort(404)
+    quiz = content.quiz
+    
+    if not content.questions:
         flash('This quiz has no questions yet', 'warning')
         return redirect(url_for('view_chapter', chapter_id=quiz.chapter_id))
     
-    return render_template('take_quiz.html', quiz=quiz, questions=questions)
+    # The clock runs on the server; reloading the page resumes the open attempt
+    attempt = start_attempt(quiz_id, quiz.time_duration, session['user_id'])
+    
+    page = render_template('take_quiz.html', quiz=quiz, questions=content.questions,
+                           questions_html=get_questions_html(quiz_id, content.questions),
+                           attempt=attempt, remaining_seconds=remaining_seconds(attempt),
+                           saved_answers=saved_answers([attempt.id])[attempt.id],
+                           autosave_interval=AUTOSAVE_CLIENT_INTERVAL)
+    record_first_request(quiz_id, time.perf_counter() - started, warmed)
+    return page
 
 @app.route('/user/quiz/<int:quiz_id>/submit', methods=['POST'])
 @login_required
 def submit_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    
-    total_questions = len(questions)
-    correct_answers = 0
-    
-    for question in questions:
-        user_answer = request.form.get(f'question_{question.id}')
-        if user_answer and int(user_answer) == question.correct_option:
-            correct_answers += 1
-    
-    total_score = correct_answers
-    accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    token = request.form.get('attempt_token', '')
+    
+    # Double-clicks and retries of a submission just finished are answered from memory
+    score_id = recent_submission(token)
+    if score_id is not None:
+        flash('This quiz attempt was already submitted', 'info')
+        return redirect(url_for('view_result', score_id=score_id))
+    
+    attempt = QuizAttempt.query.filter_by(token=token).first() if token else None
+    if not attempt or attempt.quiz_id != quiz_id or attempt.user_id != session['user_id'] or attempt.adaptive:
+        flash('Quiz attempt not found. Please start the quiz again.', 'danger')
+        return redirect(url_for('start_quiz', quiz_id=quiz_id))
+    
+    if not attempt.is_open():
+        return redirect_to_submitted(attempt)
+    
+    now = datetime.now()
+    answers = saved_answers([attempt.id])[attempt.id]
+    if is_expired(attempt, now):
+        # Answers sent after the deadline and grace period are not accepted;
+        # grade what was autosaved in time
+        score = submit_attempt(attempt, answers, now, auto_submitted=True)
+    else:
+        answers.update(answers_from_form(request.form))
+        score = submit_attempt(attempt, answers, now)
+    
+    if score is None:
+        # A concurrent submission or the expiry worker got there first
+        return redirect_to_submitted(QuizAttempt.query.get(attempt.id))
+    
+    if attempt.auto_submitted:
+        flash('Time was up, so your quiz was submitted automatically', 'warning')
+    else:
+        flash(f'Quiz submitted! Score: {score.total_score} ({score.accuracy_percentage:.2f}%)', 'success')
+    return redirect(url_for('view_result', score_id=score.id))
+
+@app.route('/user/quiz/<int:quiz_id>/adaptive', methods=['GET', 'POST'])
+@login_required
+def adaptive_quiz(quiz_id):
+    quiz = get_quiz_view(quiz_id)
+    if quiz is None:
+        abort(404)
     
-    score = Score(
-        quiz_id=quiz_id,
-        user_id=session['user_id'],
-        timestamp_of_attempt=datetime.now(),
-        total_score=total_score,
-        accuracy_percentage=accuracy
-    )
-    db.session.add(score)
-    db.session.commit()
+    if not question_count(quiz_id):
+        flash('This quiz has no questions yet', 'warning')
+        return redirect(url_for('view_chapter', chapter_id=quiz.chapter_id))
     
-    flash(f'Quiz submitted! Score: {total_score}/{total_questions} ({accuracy:.2f}%)', 'success')
-    return redirect(url_for('view_result', score_id=score.id))
+    if request.method == 'POST':
+        token = request.form.get('attempt_token', '')
+        attempt = QuizAttempt.query.filter_by(token=token).first() if token else None
+        if (not attempt or attempt.quiz_id != quiz_id or attempt.user_id != session['user_id']
+                or not attempt.adaptive):
+            flash('Quiz attempt not found. Please start the quiz again.', 'danger')
+            return redirect(url_for('adaptive_quiz', quiz_id=quiz_id))
+        
+        if not attempt.is_open():
+            return redirect_to_submitted(attempt)
+        
+        now = datetime.now()
+        time_up = attempt.deadline is not None and now > attempt.deadline
+        question_id = request.form.get('question_id', type=int)
+        option = request.form.get('answer', type=int)
+        # Only the question this attempt was served may be answered
+        if (session.get('adaptive_question') == [attempt.id, question_id] and option in VALID_OPTIONS
+                and not is_expired(attempt, now)):
+            record_outcome(attempt, question_id, option, now)
+            session.pop('adaptive_question', None)
+        elif not time_up:
+            flash('Please choose an answer', 'warning')
+            return redirect(url_for('adaptive_quiz', quiz_id=quiz_id))
+        
+        if time_up:
+            return finish_adaptive(attempt, now, auto_submitted=True)
+        return redirect(url_for('adaptive_quiz', quiz_id=quiz_id))
+    
+    attempt = start_attempt(quiz_id, quiz.time_duration, session['user_id'], adaptive=True)
+    answers = attempt_answers(attempt)
+    
+    # A reload shows the same question again instead of drawing a new one
+    served = session.get('adaptive_question')
+    question = None
+    if served and served[0] == attempt.id and served[1] not in answers:
+        question = get_question_view(served[1])
+    if question is None:
+        question_id = next_question(attempt, answers)
+        question = get_question_view(question_id) if question_id is not None else None
+    if question is None:
+        session.pop('adaptive_question', None)
+        return finish_adaptive(attempt)
+    session['adaptive_question'] = [attempt.id, question.id]
+    
+    return render_template('adaptive_quiz.html', quiz=quiz, question=question, attempt=attempt,
+                           number=len(answers) + 1, total=question_count(quiz_id),
+                           remaining_seconds=remaining_seconds(attempt))
 
 @app.route('/user/result/<int:score_id>')
 @login_required
 def view_result(score_id):
-    score = Score.query.get_or_404(score_id)
+    score = get_score_view(score_id)
+    if score is None:
+        abort(404)
     
     if score.user_id != session['user_id']:
         flash('Access denied', 'danger')
         return redirect(url_for('user_dashboard'))
     
-    return render_template('result.html', score=score)
+    leaderboard = get_leaderboard(score.quiz_id)
+    
+    return render_template('result.html', 
+                         score=score,
+                         leaderboard=leaderboard.top(),
+                         percentile=leaderboard.percentile(score.accuracy_percentage),
+                         total_attempts=leaderboard.total)
 
 @app.route('/user/performance')
 @login_required
+@replica_reads
 def performance_analysis():
     user_id = session['user_id']
-    scores = Score.query.filter_by(user_id=user_id).all()
+    granularity = request.args.get('granularity', DEFAULT_TREND_GRANULARITY)
+    max_points = clamp_trend_points(request.args.get('points', DEFAULT_TREND_POINTS, type=int))
     
-    performance_data = generate_performance_data(user_id)
+    performance_data = generate_performance_data(user_id, granularity, max_points)
     
     return render_template('performance.html', 
-                         scores=scores,
-                         performance_data=performance_data)
+                         performance_data=performance_data,
+                         granularity=granularity)
 
 # API Routes
 @app.route('/api/subjects', methods=['GET'])
+@replica_reads
 def api_subjects():
-    subjects = Subject.query.all()
+    subjects = get_subject_cards()
     return jsonify([{
         'id': s.id,
         'name': s.name,
         'description': s.description
     } for s in subjects])
 
+@app.route('/api/questions/search', methods=['GET'])
+@login_required
+@replica_reads
+def api_search_questions():
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    search = run_question_search(request.args.get('q', ''), request.args.get('page', 1, type=int))
+    return jsonify(search)
+
+@app.route('/api/attempts/<int:attempt_id>/answers', methods=['POST'])
+@login_required
+def api_autosave_answers(attempt_id):
+    context = get_attempt_context(attempt_id)
+    if context is None:
+        return jsonify({'error': 'Attempt not found or already submitted'}), 404
+    if context.user_id != session['user_id']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if is_expired(context):
+        return jsonify({'error': 'Time is up'}), 409
+    
+    payload = request.get_json(silent=True) or {}
+    raw_answers = payload.get('answers')
+    if not isinstance(raw_answers, dict):
+        return jsonify({'error': 'Expected {"answers": {question_id: option}}'}), 400
+    
+    answers = parse_answers(context, raw_answers)
+    record_answers(attempt_id, answers)
+    return jsonify({'saved': len(answers)})
+
 @app.route('/api/user/<int:user_id>/performance', methods=['GET'])
 @login_required
+@replica_reads
 def api_user_performance(user_id):
     if session['user_id'] != user_id and not session.get('is_admin'):
         return jsonify({'error': 'Unauthorized'}), 403
     
-    performance_data = generate_performance_data(user_id)
+    granularity = request.args.get('granularity', DEFAULT_TREND_GRANULARITY)
+    max_points = clamp_trend_points(request.args.get('points', DEFAULT_TREND_POINTS, type=int))
+    
+    performance_data = generate_performance_data(user_id, granularity, max_points)
     return jsonify(performance_data)
 
 if __name__ == '__main__':
+    # With the reloader, requests are served by a child process that sets WERKZEUG_RUN_MAIN
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_workers()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Benchmark adaptive question selection against serving the whole pool
+
+Times picking the next question from the difficulty index against scanning
+every question's stats, and loading the one question an adaptive page shows
+against loading and rendering the full question list take_quiz serves.
+
+Usage:
+    python benchmarks/bench_adaptive.py [pool_size]
+"""
+import random
+import sys
+import time
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from flask import render_template
+from models import db, QuestionOutcome
+from utils.adaptive import get_difficulty_index
+from utils.read_models import get_question_view, get_quiz_questions
+
+OUTCOMES_PER_QUESTION = 20
+ITERATIONS = 200
+
+def populate(pool_size):
+    user_id, = seed_users(1)
+    quiz_id, = seed_subject()
+    seed_questions([quiz_id], pool_size, padding=20)
+    rng = random.Random(0)
+    db.session.execute(db.insert(QuestionOutcome), [{
+        'question_id': question_id, 'user_id': user_id, 'selected_option': 1, 'correct': rng.random() < 0.7
+    } for question_id in range(1, pool_size + 1) for _ in range(OUTCOMES_PER_QUESTION)])
+    db.session.commit()
+    return quiz_id
+
+def linear_pick(stats, target, exclude):
+    best, best_distance = None, None
+    for question_id, (answers, wrong) in stats.items():
+        if question_id in exclude:
+            continue
+        distance = abs((wrong + 1) / (answers + 2) - target)
+        if best is None or distance < best_distance:
+            best, best_distance = question_id, distance
+    return best
+
+def per_call(func):
+    start = time.perf_counter()
+    for n in range(ITERATIONS):
+        func(n)
+    return (time.perf_counter() - start) / ITERATIONS
+
+if __name__ == '__main__':
+    pool_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    with temp_database() as app, app.test_request_context():
+        quiz_id = populate(pool_size)
+
+        start = time.perf_counter()
+        index = get_difficulty_index(quiz_id)
+        print(f'index build for {pool_size} questions: {(time.perf_counter() - start) * 1e3:.1f}ms')
+
+        stats = dict(index._stats)
+        exclude = set(range(1, 10))
+        targets = [0.1 + 0.8 * n / ITERATIONS for n in range(ITERATIONS)]
+        indexed = per_call(lambda n: index.nearest(targets[n], exclude))
+        scanned = per_call(lambda n: linear_pick(stats, targets[n], exclude))
+        print(f'next question   index {indexed * 1e6:9.1f}us   linear scan {scanned * 1e6:9.1f}us')
+        updated = per_call(lambda n: index.record(n % pool_size + 1, n % 2 == 0))
+        print(f'record outcome  {updated * 1e6:9.1f}us')
+
+        single = per_call(lambda n: get_question_view(n % pool_size + 1))
+        start = time.perf_counter()
+        render_template('quiz_questions.html', questions=get_quiz_questions(quiz_id))
+        full = time.perf_counter() - start
+        print(f'page data       one question {single * 1e3:.3f}ms   full pool load + render {full * 1e3:.1f}ms')
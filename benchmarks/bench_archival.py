@@ -0,0 +1,69 @@
+"""
+Benchmark analytics on a hot scores table before and after archival
+
+Fills the database with three years of scores, times generate_performance_data
+and get_admin_analytics, archives everything older than the retention horizon
+into per-quiz rollups, then times the same calls again and checks that the
+lifetime totals did not change.
+
+Usage:
+    python benchmarks/bench_archival.py [retention_days]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import temp_database, seed_users, seed_subject
+from models import db, Score
+from utils.archive import archive_scores
+from utils.charts import generate_performance_data, get_admin_analytics
+
+USERS = 200
+CHAPTERS = 20
+QUIZZES_PER_CHAPTER = 10
+SCORES_PER_USER = 500
+HISTORY_DAYS = 3 * 365
+ITERATIONS = 20
+
+def populate(now):
+    user_ids = seed_users(USERS)
+    quiz_ids = seed_subject(chapters=CHAPTERS, quizzes_per_chapter=QUIZZES_PER_CHAPTER)
+    rng = random.Random(0)
+    db.session.execute(db.insert(Score), [{
+        'quiz_id': rng.choice(quiz_ids), 'user_id': user_id,
+        'timestamp_of_attempt': now - timedelta(days=HISTORY_DAYS * n / SCORES_PER_USER),
+        'total_score': rng.randint(0, 10), 'accuracy_percentage': rng.uniform(0, 100)
+    } for user_id in user_ids for n in range(SCORES_PER_USER)])
+    db.session.commit()
+
+def timed(func):
+    func()
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        result = func()
+        db.session.remove()
+    return (time.perf_counter() - start) / ITERATIONS, result
+
+def measure(label):
+    hot = Score.query.count()
+    user_latency, performance = timed(lambda: generate_performance_data(USERS // 2))
+    admin_latency, analytics = timed(get_admin_analytics)
+    print(f'{label:<15} {hot:>7} hot scores  performance {user_latency * 1e3:7.2f}ms  '
+          f'admin analytics {admin_latency * 1e3:7.2f}ms')
+    return (performance['total_quizzes'], performance['total_score'], performance['overall_accuracy'],
+            analytics['total_attempts'], analytics['average_accuracy'])
+
+if __name__ == '__main__':
+    retention_days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    with temp_database() as app, app.test_request_context():
+        now = datetime.now()
+        populate(now)
+        before = measure('before archival')
+
+        start = time.perf_counter()
+        archived = archive_scores(retention_days, now)
+        print(f'archived {archived} scores in {time.perf_counter() - start:.2f}s')
+
+        after = measure('after archival')
+        print('lifetime totals unchanged' if before == after else f'totals differ: {before} vs {after}')
@@ -0,0 +1,98 @@
+"""
+Benchmark the attempt expiry scheduler and batched auto-submit
+
+Schedules a large number of open attempts, measures schedule / cancel /
+pop_due costs, compares one tick against scanning every open attempt, and
+times auto-submitting expired attempts in batches against the database.
+
+Usage:
+    python benchmarks/bench_attempt_scheduler.py [open_attempts]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from models import db, QuizAttempt
+from utils import attempts
+from utils.scheduler import DeadlineScheduler
+
+QUESTIONS_PER_QUIZ = 20
+QUIZZES = 50
+EXPIRED_ATTEMPTS = 10000
+
+def bench_scheduler(n):
+    now = datetime.now()
+    deadlines = [now + timedelta(seconds=random.randint(1, 3600)) for _ in range(n)]
+    scheduler = DeadlineScheduler()
+
+    start = time.perf_counter()
+    for key, deadline in enumerate(deadlines):
+        scheduler.schedule(key, deadline)
+    schedule = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for key in range(0, n, 10):
+        scheduler.cancel(key)
+    cancel = (time.perf_counter() - start) / (n // 10)
+
+    # A one-second tick: only the attempts due in that second are touched
+    tick_at = now + timedelta(seconds=1800)
+    scheduler.pop_due(now + timedelta(seconds=1799))
+    start = time.perf_counter()
+    due = scheduler.pop_due(tick_at)
+    tick = time.perf_counter() - start
+
+    # The alternative: scan every open attempt each tick
+    open_deadlines = dict(enumerate(deadlines))
+    start = time.perf_counter()
+    scanned = [key for key, deadline in open_deadlines.items() if deadline <= tick_at]
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scheduler.load((key, deadline) for key, deadline in enumerate(deadlines))
+    load = time.perf_counter() - start
+
+    print(f'scheduler with {n} open attempts')
+    print(f'  schedule         {schedule * 1e6:8.2f}us/attempt')
+    print(f'  cancel           {cancel * 1e6:8.2f}us/attempt')
+    print(f'  tick ({len(due):4d} due)  {tick * 1e3:8.2f}ms')
+    print(f'  full scan        {scan * 1e3:8.2f}ms ({len(scanned)} matched)')
+    print(f'  load on restart  {load * 1e3:8.2f}ms')
+
+def populate(n):
+    user_ids = seed_users(n)
+    quiz_ids = seed_subject(quizzes_per_chapter=QUIZZES)
+    seed_questions(quiz_ids, QUESTIONS_PER_QUIZ)
+
+    started = datetime.now() - timedelta(hours=1)
+    db.session.execute(db.insert(QuizAttempt), [{
+        'quiz_id': quiz_ids[i % QUIZZES], 'user_id': user_ids[i], 'started_at': started,
+        'deadline': started + timedelta(minutes=30), 'auto_submitted': False
+    } for i in range(n)])
+    db.session.commit()
+
+def bench_expiry(n):
+    with temp_database():
+        populate(n)
+        start = time.perf_counter()
+        loaded = attempts.load_open_attempts()
+        load = time.perf_counter() - start
+
+        # Expire a slice of the open attempts in scheduler-sized batches
+        attempts.scheduler.load(list(attempts.scheduler._deadlines.items())[:EXPIRED_ATTEMPTS])
+        start = time.perf_counter()
+        submitted = attempts.expire_due_attempts()
+        expire = time.perf_counter() - start
+
+    print(f'auto-submit against SQLite ({loaded} open attempts)')
+    print(f'  load from db     {load * 1e3:8.2f}ms')
+    print(f'  expire {submitted} in batches of {attempts.EXPIRY_BATCH_SIZE}: '
+          f'{expire:.2f}s ({expire / submitted * 1e6:.1f}us/attempt)')
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(42)
+    bench_scheduler(n)
+    bench_expiry(n)
@@ -0,0 +1,70 @@
+"""
+Benchmark buffered autosave against writing every delta straight away
+
+Simulates students changing answers on a shared quiz and compares one
+upsert-and-commit per autosave request with buffering deltas in memory and
+flushing them in periodic batches.
+
+Usage:
+    python benchmarks/bench_autosave.py [students] [deltas_per_student]
+"""
+import random
+import sys
+import time
+from datetime import datetime
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from models import db, QuizAttempt, AttemptAnswer
+from utils import autosave
+
+QUESTIONS = 30
+# Deltas buffered between flushes: students x requests per flush interval
+DELTAS_PER_FLUSH = 2000
+
+def populate(students):
+    user_ids = seed_users(students)
+    quiz_id, = seed_subject(time_duration='01:00')
+    seed_questions([quiz_id], QUESTIONS)
+    db.session.execute(db.insert(QuizAttempt), [
+        {'quiz_id': quiz_id, 'user_id': user_id, 'started_at': datetime.now(), 'auto_submitted': False}
+        for user_id in user_ids
+    ])
+    db.session.commit()
+    return list(range(1, students + 1)), list(range(1, QUESTIONS + 1))
+
+def make_deltas(attempt_ids, question_ids, per_student):
+    deltas = [(attempt_id, {random.choice(question_ids): random.randint(1, 4)})
+              for attempt_id in attempt_ids for _ in range(per_student)]
+    random.shuffle(deltas)
+    return deltas
+
+def direct(deltas):
+    for attempt_id, answers in deltas:
+        autosave.record_answers(attempt_id, answers)
+        autosave.flush_answers()
+    return len(deltas)
+
+def buffered(deltas):
+    flushes = 0
+    for i, (attempt_id, answers) in enumerate(deltas, 1):
+        autosave.record_answers(attempt_id, answers)
+        if i % DELTAS_PER_FLUSH == 0:
+            autosave.flush_answers()
+            flushes += 1
+    autosave.flush_answers()
+    return flushes + 1
+
+if __name__ == '__main__':
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_student = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    for label, run in (('direct', direct), ('buffered', buffered)):
+        random.seed(42)
+        with temp_database():
+            attempt_ids, question_ids = populate(students)
+            deltas = make_deltas(attempt_ids, question_ids, per_student)
+            start = time.perf_counter()
+            commits = run(deltas)
+            elapsed = time.perf_counter() - start
+            rows = db.session.query(AttemptAnswer).count()
+        print(f'{label:<9} {len(deltas)} deltas: {elapsed:7.2f}s '
+              f'({elapsed / len(deltas) * 1e6:7.1f}us/delta), {commits} commits, {rows} rows')
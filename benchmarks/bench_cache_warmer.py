@@ -0,0 +1,67 @@
+"""
+Benchmark first-request latency for a quiz with and without cache warming
+
+Each trial starts from a fresh database connection (empty SQLite page cache)
+and empty application caches, then times the data loading and question-list
+rendering the first take_quiz request does, either straight away (cold) or
+after the warmer has run (warmed).
+
+Usage:
+    python benchmarks/bench_cache_warmer.py [trials]
+"""
+import statistics
+import sys
+import time
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from models import db, Score
+from utils import quiz_cache
+from utils.leaderboard import invalidate_leaderboard
+
+QUIZZES = 200
+QUESTIONS_PER_QUIZ = 50
+SCORES_PER_QUIZ = 500
+
+def populate():
+    user_ids = seed_users(100)
+    quiz_ids = seed_subject(quizzes_per_chapter=QUIZZES)
+    # Interleave rows across quizzes so each quiz's rows are spread over many pages
+    seed_questions(quiz_ids, QUESTIONS_PER_QUIZ, padding=20, interleave=True)
+    db.session.execute(db.insert(Score), [{
+        'quiz_id': quiz_id, 'user_id': user_ids[n % len(user_ids)],
+        'total_score': n % 50, 'accuracy_percentage': n % 100
+    } for n in range(SCORES_PER_QUIZ) for quiz_id in quiz_ids])
+    db.session.commit()
+
+def first_request(quiz_id):
+    start = time.perf_counter()
+    content = quiz_cache.get_quiz_content(quiz_id)
+    quiz_cache.get_questions_html(quiz_id, content.questions)
+    return time.perf_counter() - start
+
+def reset():
+    db.session.remove()
+    db.engine.dispose()
+    quiz_cache.invalidate_quiz_content()
+    invalidate_leaderboard()
+
+if __name__ == '__main__':
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with temp_database():
+        populate()
+        cold, warmed, warm_cost = [], [], []
+        for trial in range(trials):
+            quiz_id = trial % QUIZZES + 1
+            reset()
+            cold.append(first_request(quiz_id))
+
+            reset()
+            start = time.perf_counter()
+            quiz_cache.warm_quiz(quiz_id)
+            warm_cost.append(time.perf_counter() - start)
+            warmed.append(first_request(quiz_id))
+
+    for label, samples in (('cold first request', cold), ('warmed first request', warmed),
+                           ('warmer run (off the request path)', warm_cost)):
+        print(f'{label:<36} median {statistics.median(samples) * 1e3:8.3f}ms '
+              f'max {max(samples) * 1e3:8.3f}ms')
@@ -0,0 +1,86 @@
+"""
+Benchmark deleting a subject with 100k scores
+
+Compares the database-level ON DELETE CASCADE path used by delete_subject with
+the previous behaviour, where the ORM loaded every chapter, quiz, question and
+score into the session and deleted them one statement at a time.
+
+Usage:
+    python benchmarks/bench_cascade_delete.py [num_scores]
+"""
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from sqlalchemy.exc import SAWarning
+from models import db, Subject, Score
+
+# pysqlite under-reports executemany rowcounts for the batched ORM deletes
+warnings.filterwarnings('ignore', category=SAWarning)
+
+CHAPTERS = 10
+QUIZZES_PER_CHAPTER = 10
+QUESTIONS_PER_QUIZ = 20
+
+def populate(num_scores):
+    """Insert one subject whose quizzes carry num_scores attempts"""
+    now = datetime.now()
+    user_ids = seed_users(100)
+    quiz_ids = seed_subject(chapters=CHAPTERS, quizzes_per_chapter=QUIZZES_PER_CHAPTER)
+    seed_questions(quiz_ids, QUESTIONS_PER_QUIZ)
+    db.session.execute(db.insert(Score), [{
+        'quiz_id': quiz_ids[i % len(quiz_ids)],
+        'user_id': user_ids[i % len(user_ids)],
+        'timestamp_of_attempt': now,
+        'total_score': i % QUESTIONS_PER_QUIZ,
+        'accuracy_percentage': (i % 100) * 1.0
+    } for i in range(num_scores)])
+    db.session.commit()
+    return db.session.scalar(db.select(Subject.id))
+
+def delete_with_orm_cascade(subject_id):
+    """Previous behaviour: load and delete every child row through the session"""
+    # The old schema had no cascading foreign keys and SQLite left enforcement off
+    db.session.execute(db.text('PRAGMA foreign_keys=OFF'))
+    subject = db.session.get(Subject, subject_id)
+    for chapter in subject.chapters:
+        for quiz in chapter.quizzes:
+            for score in quiz.scores:
+                db.session.delete(score)
+            for question in quiz.questions:
+                db.session.delete(question)
+            db.session.delete(quiz)
+        db.session.delete(chapter)
+    db.session.delete(subject)
+    db.session.commit()
+
+def delete_with_db_cascade(subject_id):
+    """Current behaviour: one DELETE, children removed by ON DELETE CASCADE"""
+    subject = db.session.get(Subject, subject_id)
+    db.session.delete(subject)
+    db.session.commit()
+
+def measure(label, num_scores, delete):
+    with temp_database():
+        subject_id = populate(num_scores)
+        db.session.expunge_all()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        delete(subject_id)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        remaining = db.session.query(Score).count()
+        print(f'{label:<20} {elapsed:8.3f}s  peak {peak / 1024 / 1024:8.2f} MiB  scores left {remaining}')
+
+if __name__ == '__main__':
+    num_scores = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'Deleting a subject with {num_scores} scores, '
+          f'{CHAPTERS * QUIZZES_PER_CHAPTER * QUESTIONS_PER_QUIZ} questions')
+    measure('ORM cascade', num_scores, delete_with_orm_cascade)
+    measure('ON DELETE CASCADE', num_scores, delete_with_db_cascade)
@@ -0,0 +1,91 @@
+"""
+Benchmark near-duplicate detection on a 500k-question bank
+
+Builds the MinHash/LSH index from synthetic questions (a share of which are
+reworded copies), then compares the per-insert duplicate check against a
+brute-force Jaccard scan over every existing question.
+
+Usage:
+    python benchmarks/bench_dedup.py [num_questions]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dedup import DuplicateIndex, shingles, minhash_signature, build_duplicate_report
+import utils.dedup as dedup
+
+VOCABULARY = [f'term{i}' for i in range(20000)]
+TEMPLATES = [
+    'What is the primary function of {} in {}?',
+    'Which of the following best describes {} when used with {}?',
+    'How does {} differ from {} in practice?',
+    'In which scenario would you use {} together with {}?'
+]
+DUPLICATE_RATE = 0.05
+
+def make_question(rng):
+    statement = rng.choice(TEMPLATES).format(*rng.sample(VOCABULARY, 2)) + ' ' + ' '.join(rng.sample(VOCABULARY, 4))
+    options = [' '.join(rng.sample(VOCABULARY, 3)) for _ in range(4)]
+    return statement, options
+
+def reword(question, rng):
+    """Near-duplicate: different case and punctuation, shuffled options"""
+    statement, options = question
+    options = options[:]
+    rng.shuffle(options)
+    return statement.upper().replace('?', ' ?!'), options
+
+def generate_bank(num_questions, rng):
+    bank = []
+    for _ in range(num_questions):
+        if bank and rng.random() < DUPLICATE_RATE:
+            bank.append(reword(rng.choice(bank), rng))
+        else:
+            bank.append(make_question(rng))
+    return bank
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0
+
+if __name__ == '__main__':
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    rng = random.Random(7)
+
+    bank = generate_bank(num_questions, rng)
+    print(f'{num_questions} questions, ~{int(DUPLICATE_RATE * 100)}% reworded duplicates')
+
+    index = DuplicateIndex()
+    features = []
+    start = time.perf_counter()
+    for question_id, (statement, options) in enumerate(bank):
+        feature_set = shingles(statement, options)
+        features.append(feature_set)
+        index.add(question_id, minhash_signature(feature_set))
+    elapsed = time.perf_counter() - start
+    print(f'Index build           {elapsed:8.2f}s  ({elapsed / num_questions * 1e6:.0f} us/question)')
+
+    probes = [reword(rng.choice(bank), rng) for _ in range(200)]
+    start = time.perf_counter()
+    hits = 0
+    for statement, options in probes:
+        hits += bool(index.query(minhash_signature(shingles(statement, options))))
+    elapsed = time.perf_counter() - start
+    print(f'LSH check on insert   {elapsed / len(probes) * 1e3:8.3f}ms per question  ({hits}/{len(probes)} duplicates flagged)')
+
+    probe_features = [shingles(statement, options) for statement, options in probes[:5]]
+    start = time.perf_counter()
+    for probe in probe_features:
+        any(jaccard(probe, existing) >= dedup.DUPLICATE_THRESHOLD for existing in features)
+    elapsed = time.perf_counter() - start
+    print(f'Brute-force check     {elapsed / len(probe_features) * 1e3:8.3f}ms per question')
+
+    # Reuse the in-process index for the bank-wide report
+    dedup._index = index
+    start = time.perf_counter()
+    groups = build_duplicate_report()
+    elapsed = time.perf_counter() - start
+    print(f'Bank-wide report      {elapsed:8.2f}s  ({len(groups)} clusters, {sum(len(g) for g in groups)} questions)')
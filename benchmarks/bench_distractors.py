@@ -0,0 +1,72 @@
+"""
+Benchmark similarity-based distractor selection on a large knowledge base
+
+Builds a synthetic knowledge base and times one generation run, where every
+question's distractors come from a single batched similarity computation.
+
+Usage:
+    python benchmarks/bench_distractors.py [num_topics] [questions_per_run]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.distractors import build_distractor_engine
+
+CATEGORIES = ('definitions', 'characteristics', 'applications')
+ENTRIES_PER_CATEGORY = 10
+VOCABULARY = [f'word{i}' for i in range(5000)]
+
+def make_knowledge_base(num_topics, rng):
+    return {
+        f'topic{t}': {
+            category: [' '.join(rng.sample(VOCABULARY, 4)) for _ in range(ENTRIES_PER_CATEGORY)]
+            for category in CATEGORIES
+        }
+        for t in range(num_topics)
+    }
+
+def random_distractors(knowledge_base, topic, category, rng):
+    """Previous behaviour: uniform sample from every other topic"""
+    pool = []
+    for other, sections in knowledge_base.items():
+        if other != topic:
+            pool.extend(sections[category])
+    return rng.sample(pool, 3)
+
+if __name__ == '__main__':
+    num_topics = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_run = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(3)
+
+    knowledge_base = make_knowledge_base(num_topics, rng)
+    entries = num_topics * len(CATEGORIES) * ENTRIES_PER_CATEGORY
+
+    start = time.perf_counter()
+    engine = build_distractor_engine(knowledge_base, seed=3)
+    if engine is None:
+        sys.exit('numpy is not installed')
+    print(f'{entries} knowledge-base entries, engine built in {time.perf_counter() - start:.2f}s')
+
+    answers = []
+    for _ in range(per_run):
+        topic = rng.choice(list(knowledge_base))
+        category = rng.choice(CATEGORIES)
+        answers.append((topic, category, rng.choice(knowledge_base[topic][category])))
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        engine.select(answers)
+    elapsed = time.perf_counter() - start
+    print(f'Similarity selection  {elapsed / runs / per_run * 1e6:10.1f} us/question')
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        for topic, category, _answer in answers:
+            random_distractors(knowledge_base, topic, category, rng)
+    elapsed = time.perf_counter() - start
+    print(f'Uniform random.sample {elapsed / runs / per_run * 1e6:10.1f} us/question')
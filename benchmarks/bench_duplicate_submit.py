@@ -0,0 +1,61 @@
+"""
+Benchmark handling of repeated quiz submissions
+
+Compares the work done for a duplicate submission when it is answered from
+the recently-seen cache, from the attempt-token index, and when it is graded
+again as the old submit handler did.
+
+Usage:
+    python benchmarks/bench_duplicate_submit.py [iterations]
+"""
+import sys
+import time
+from datetime import datetime
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from models import db, Quiz, QuizAttempt, Score
+from utils import attempts
+from utils.read_models import get_answer_key
+
+QUESTIONS = 50
+
+def populate():
+    user_id, = seed_users(1)
+    quiz_id, = seed_subject()
+    seed_questions([quiz_id], QUESTIONS)
+    db.session.commit()
+
+    attempt = attempts.start_attempt(quiz_id, db.session.get(Quiz, quiz_id).time_duration, user_id)
+    answers = {question_id: 1 for question_id in get_answer_key(quiz_id)}
+    attempts.submit_attempt(attempt, answers)
+    return attempt.token, quiz_id, user_id, answers
+
+def cached(token, quiz_id, user_id, answers):
+    return attempts.recent_submission(token)
+
+def indexed(token, quiz_id, user_id, answers):
+    attempt = QuizAttempt.query.filter_by(token=token).first()
+    return attempt.score_id
+
+def regraded(token, quiz_id, user_id, answers):
+    # What a retried POST cost before attempt tokens: grade and insert again
+    answer_key = get_answer_key(quiz_id)
+    correct = attempts.grade_answers(answer_key, answers)
+    score = Score(quiz_id=quiz_id, user_id=user_id, timestamp_of_attempt=datetime.now(),
+                  total_score=correct, accuracy_percentage=correct / len(answer_key) * 100)
+    db.session.add(score)
+    db.session.commit()
+    return score.id
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with temp_database():
+        args = populate()
+        for label, handle in (('cache hit', cached), ('token index', indexed), ('regrade', regraded)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                handle(*args)
+                db.session.remove()
+            elapsed = (time.perf_counter() - start) / iterations
+            print(f'{label:<12} {elapsed * 1e6:9.1f}us/duplicate')
+        print(f'scores written by regrade path: {Score.query.count() - 1}')
@@ -0,0 +1,86 @@
+"""
+Benchmark fragment caching and the Jinja bytecode cache
+
+Times the user-independent parts of user_dashboard and take_quiz rendered on
+every request against serving them from the fragment cache, and the time a
+fresh worker spends loading every template with and without compiled
+bytecode on disk.
+
+Usage:
+    python benchmarks/bench_fragments.py [iterations]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import ROOT, temp_database, seed_subject, seed_questions
+from flask import render_template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from models import db
+from utils.fragments import cached_fragment, CATALOG
+from utils.quiz_cache import get_quiz_content, get_questions_html
+from utils.read_models import get_subject_cards
+
+SUBJECTS = 30
+CHAPTERS_PER_SUBJECT = 8
+QUESTIONS_PER_QUIZ = 50
+
+def add_routes(app):
+    # subject_cards.html links to the subject page
+    app.add_url_rule('/user/subject/<int:subject_id>', 'view_subject')
+
+def populate():
+    quiz_ids = []
+    for s in range(SUBJECTS):
+        quiz_ids += seed_subject(f'Subject {s}', 'A subject used for benchmarking ' * 5,
+                                 chapters=CHAPTERS_PER_SUBJECT)
+    seed_questions(quiz_ids[:1], QUESTIONS_PER_QUIZ, padding=20)
+    db.session.commit()
+    return quiz_ids[0]
+
+def per_request(render, iterations):
+    render()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+        db.session.remove()
+    return (time.perf_counter() - start) / iterations
+
+def load_all_templates(bytecode_cache):
+    env = Environment(loader=FileSystemLoader(os.path.join(ROOT, 'templates')), bytecode_cache=bytecode_cache)
+    start = time.perf_counter()
+    for name in env.list_templates():
+        env.get_template(name)
+    return time.perf_counter() - start
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    cache_dir = tempfile.mkdtemp()
+    try:
+        with temp_database(add_routes) as app, app.test_request_context():
+            quiz_id = populate()
+            questions = get_quiz_content(quiz_id).questions
+
+            cases = [
+                ('subject grid', 'render',
+                 lambda: render_template('subject_cards.html', subjects=get_subject_cards())),
+                ('subject grid', 'cached',
+                 lambda: cached_fragment('subject_cards.html', (CATALOG,),
+                                         lambda: {'subjects': get_subject_cards()})),
+                ('question list', 'render',
+                 lambda: render_template('quiz_questions.html', questions=questions)),
+                ('question list', 'cached',
+                 lambda: get_questions_html(quiz_id, questions)),
+            ]
+            for fragment, label, render in cases:
+                latency = per_request(render, iterations)
+                print(f'{fragment:<14} {label:<7} {latency * 1e6:9.1f}us/request')
+
+        cold = load_all_templates(None)
+        load_all_templates(FileSystemBytecodeCache(cache_dir))
+        warm = load_all_templates(FileSystemBytecodeCache(cache_dir))
+        print(f'worker template load: {cold * 1e3:.1f}ms compiling, {warm * 1e3:.1f}ms from bytecode cache')
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,109 @@
+"""
+Benchmark read-model DTOs against hydrated ORM objects
+
+Times the data loading behind take_quiz, result and user_dashboard both ways,
+including the lazy relationship loads the templates used to trigger, and
+records the memory allocated per request.
+
+Usage:
+    python benchmarks/bench_read_models.py [iterations]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from common import temp_database, seed_users, seed_subject, seed_questions
+from models import db, Subject, Quiz, Question, Score
+from utils.read_models import (get_quiz_view, get_quiz_questions, get_score_view,
+                               get_recent_scores, get_subject_cards)
+
+SUBJECTS = 20
+CHAPTERS_PER_SUBJECT = 5
+QUESTIONS_PER_QUIZ = 50
+SCORES_PER_USER = 200
+
+def populate():
+    user_id, = seed_users(1)
+    quizzes = []
+    for s in range(SUBJECTS):
+        quizzes += seed_subject(f'Subject {s}', 'Benchmark subject', chapters=CHAPTERS_PER_SUBJECT)
+    seed_questions(quizzes, QUESTIONS_PER_QUIZ)
+
+    db.session.execute(db.insert(Score), [{
+        'quiz_id': quizzes[i % len(quizzes)],
+        'user_id': user_id,
+        'timestamp_of_attempt': datetime.now(),
+        'total_score': 10,
+        'accuracy_percentage': 20.0
+    } for i in range(SCORES_PER_USER)])
+    db.session.commit()
+    return user_id, quizzes[0], db.session.query(Score.id).first()[0]
+
+def orm_take_quiz(quiz_id, user_id, score_id):
+    quiz = db.session.get(Quiz, quiz_id)
+    questions = Question.query.filter_by(quiz_id=quiz_id).all()
+    return (quiz.chapter.subject.name, quiz.chapter.name,
+            [(q.id, q.question_statement, q.option1, q.option2, q.option3, q.option4) for q in questions])
+
+def dto_take_quiz(quiz_id, user_id, score_id):
+    quiz = get_quiz_view(quiz_id)
+    questions = get_quiz_questions(quiz_id)
+    return (quiz.subject_name, quiz.chapter_name,
+            [(q.id, q.question_statement, q.option1, q.option2, q.option3, q.option4) for q in questions])
+
+def orm_result(quiz_id, user_id, score_id):
+    score = db.session.get(Score, score_id)
+    return (score.total_score, len(score.quiz.questions), score.quiz.chapter.subject.name,
+            score.quiz.chapter.name, score.quiz.date_of_quiz)
+
+def dto_result(quiz_id, user_id, score_id):
+    score = get_score_view(score_id)
+    return (score.total_score, score.total_questions, score.subject_name,
+            score.chapter_name, score.date_of_quiz)
+
+def orm_dashboard(quiz_id, user_id, score_id):
+    subjects = Subject.query.all()
+    recent = Score.query.filter_by(user_id=user_id).order_by(Score.timestamp_of_attempt.desc()).limit(5).all()
+    return ([(s.name, len(s.chapters)) for s in subjects],
+            [(r.quiz.chapter.subject.name, r.quiz.chapter.name, r.total_score) for r in recent])
+
+def dto_dashboard(quiz_id, user_id, score_id):
+    subjects = get_subject_cards()
+    recent = get_recent_scores(user_id, limit=5)
+    return ([(s.name, s.chapter_count) for s in subjects],
+            [(r.subject_name, r.chapter_name, r.total_score) for r in recent])
+
+def measure(load, args, iterations):
+    # Each iteration starts from an empty session, as a new request would
+    db.session.remove()
+    load(*args)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        load(*args)
+        db.session.remove()
+    latency = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    load(*args)
+    allocated, _ = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    db.session.remove()
+    return latency, allocated, blocks
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with temp_database():
+        args = populate()
+        print(f'{"page":<12} {"path":<5} {"latency":>10} {"retained":>10} {"blocks":>8}')
+        for page, orm, dto in [
+            ('take_quiz', orm_take_quiz, dto_take_quiz),
+            ('result', orm_result, dto_result),
+            ('dashboard', orm_dashboard, dto_dashboard),
+        ]:
+            for label, load in (('ORM', orm), ('DTO', dto)):
+                latency, allocated, blocks = measure(load, args, iterations)
+                print(f'{page:<12} {label:<5} {latency * 1e3:8.2f}ms {allocated / 1024:8.1f}KB {blocks:8d}')
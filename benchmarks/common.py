@@ -0,0 +1,97 @@
+"""
+Shared setup for the database benchmarks
+
+Each benchmark runs against a throwaway SQLite file bound to a minimal Flask
+app, seeded with the subjects, chapters, quizzes, questions and users it
+needs. Importing this module also puts the project root on sys.path so the
+benchmarks can import models and utils.
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from models import db, User, Subject, Chapter, Quiz, Question
+
+def create_app(path):
+    app = Flask(__name__, template_folder=os.path.join(ROOT, 'templates'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+@contextmanager
+def temp_database(setup=None):
+    """
+    App context on an empty temporary database with every table created
+
+    Args:
+        setup: Optional callable run on the app before its context is pushed,
+               e.g. to register url rules templates link to
+
+    Yields:
+        The app; the database file is removed on exit
+    """
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app(path)
+        if setup is not None:
+            setup(app)
+        with app.app_context():
+            db.create_all()
+            try:
+                yield app
+            finally:
+                db.session.remove()
+                db.engine.dispose()
+    finally:
+        os.remove(path)
+
+def seed_users(count, prefix='student'):
+    """Insert count students and return their ids"""
+    db.session.execute(db.insert(User), [
+        {'username': f'{prefix}{i}@quiz.com', 'password': 'x', 'full_name': f'Student {i}'}
+        for i in range(count)
+    ])
+    return list(db.session.scalars(db.select(User.id).order_by(User.id)))
+
+def seed_subject(name='Benchmark', description=None, chapters=1, quizzes_per_chapter=1, time_duration='00:30'):
+    """
+    Insert one subject with its chapters and their quizzes
+
+    Returns:
+        List of quiz ids, chapter by chapter
+    """
+    subject = Subject(name=name, description=description)
+    db.session.add(subject)
+    db.session.flush()
+    chapter_rows = [Chapter(subject_id=subject.id, name=f'Chapter {c}') for c in range(chapters)]
+    db.session.add_all(chapter_rows)
+    db.session.flush()
+    quiz_rows = [Quiz(chapter_id=chapter.id, date_of_quiz=date.today(), time_duration=time_duration)
+                 for chapter in chapter_rows for _ in range(quizzes_per_chapter)]
+    db.session.add_all(quiz_rows)
+    db.session.flush()
+    return [quiz.id for quiz in quiz_rows]
+
+def seed_questions(quiz_ids, per_quiz, padding=0, interleave=False):
+    """
+    Insert per_quiz questions into each quiz, all answered by option 1
+
+    Args:
+        padding: Extra words appended to each statement to mimic real question text
+        interleave: Spread each quiz's rows over the table instead of storing them together
+    """
+    pairs = ([(quiz_id, n) for n in range(per_quiz) for quiz_id in quiz_ids] if interleave
+             else [(quiz_id, n) for quiz_id in quiz_ids for n in range(per_quiz)])
+    db.session.execute(db.insert(Question), [{
+        'quiz_id': quiz_id, 'question_statement': f'Question {n} of quiz {quiz_id}? ' + 'context ' * padding,
+        'option1': 'Option A', 'option2': 'Option B', 'option3': 'Option C', 'option4': 'Option D',
+        'correct_option': 1
+    } for quiz_id, n in pairs])
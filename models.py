@@ -1,7 +1,61 @@
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+import secrets
+import sqlite3
 
-db = SQLAlchemy()
+# Bind key of the optional read replica (see utils/replica.py)
+REPLICA_BIND = 'replica'
+
+# Bind key of the shard the current request or job works on (see utils/sharding.py)
+current_shard = ContextVar('current_shard', default=None)
+
+class RoutingSession(Session):
+    """
+    Session that routes queries to a shard or the read replica
+
+    While a shard is selected every statement goes to it. Otherwise reads go
+    to the read replica when the current request allows it, and flushes and
+    INSERT/UPDATE/DELETE statements go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = current_shard.get()
+        if bind is None and shard is not None:
+            return self._db.engines[shard]
+        if (bind is None and not self._flushing
+                and has_request_context() and g.get('use_replica')
+                and not getattr(clause, 'is_dml', False)):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are enabled per connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+def new_attempt_token():
+    return secrets.token_urlsafe(16)
+
+def parse_duration(time_duration):
+    """Parse a quiz duration (HH:MM) into a timedelta, or None if unset or malformed"""
+    try:
+        hours, minutes = (int(part) for part in (time_duration or '').split(':'))
+    except ValueError:
+        return None
+    duration = timedelta(hours=hours, minutes=minutes)
+    return duration if duration > timedelta(0) else None
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -16,7 +70,7 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    scores = db.relationship('Score', backref='user', lazy=True, cascade='all, delete-orphan')
+    scores = db.relationship('Score', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -30,7 +84,7 @@ class Subject(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    chapters = db.relationship('Chapter', backref='subject', lazy=True, cascade='all, delete-orphan')
+    chapters = db.relationship('Chapter', backref='subject', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Subject {self.name}>'
@@ -39,13 +93,13 @@ class Chapter(db.Model):
     __tablename__ = 'chapters'
     
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    quizzes = db.relationship('Quiz', backref='chapter', lazy=True, cascade='all, delete-orphan')
+    quizzes = db.relationship('Quiz', backref='chapter', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Chapter {self.name}>'
@@ -54,27 +108,30 @@ class Quiz(db.Model):
     __tablename__ = 'quizzes'
     
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id', ondelete='CASCADE'), nullable=False, index=True)
     date_of_quiz = db.Column(db.Date, nullable=False)
     time_duration = db.Column(db.String(10))  # Format: HH:MM
     remarks = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan')
-    scores = db.relationship('Score', backref='quiz', lazy=True, cascade='all, delete-orphan')
+    questions = db.relationship('Question', backref='quiz', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    scores = db.relationship('Score', backref='quiz', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Quiz {self.id} - {self.chapter.name}>'
     
     def get_total_questions(self):
         return len(self.questions)
+    
+    def get_duration(self):
+        return parse_duration(self.time_duration)
 
 class Question(db.Model):
     __tablename__ = 'questions'
     
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
     question_statement = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(200), nullable=False)
     option2 = db.Column(db.String(200), nullable=False)
@@ -92,13 +149,105 @@ class Question(db.Model):
 
 class Score(db.Model):
     __tablename__ = 'scores'
+    # Ids are never reused, and each shard hands them out from its own range
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    timestamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    timestamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     total_score = db.Column(db.Integer, nullable=False)
     accuracy_percentage = db.Column(db.Float, nullable=False)
+    # Token of the attempt that produced this score; the unique index stops a
+    # retried submission from recording a second score
+    attempt_token = db.Column(db.String(32), unique=True, index=True)
+    
+    def __repr__(self):
+        return f'<Score {self.id} - User {self.user_id} - Quiz {self.quiz_id}>'
+
+class QuizAttempt(db.Model):
+    __tablename__ = 'quiz_attempts'
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    deadline = db.Column(db.DateTime)  # None for untimed quizzes
+    submitted_at = db.Column(db.DateTime, index=True)
+    auto_submitted = db.Column(db.Boolean, default=False, nullable=False)
+    score_id = db.Column(db.Integer, db.ForeignKey('scores.id', ondelete='SET NULL'), index=True)
+    # Unguessable id the quiz form submits with, issued by start_quiz
+    token = db.Column(db.String(32), unique=True, index=True, default=new_attempt_token)
+    # Adaptive attempts serve one question at a time (see utils/adaptive.py)
+    adaptive = db.Column(db.Boolean)
+    
+    def __repr__(self):
+        return f'<QuizAttempt {self.id} - User {self.user_id} - Quiz {self.quiz_id}>'
+    
+    def is_open(self):
+        return self.submitted_at is None
+
+class AttemptAnswer(db.Model):
+    __tablename__ = 'attempt_answers'
+    
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempts.id', ondelete='CASCADE'), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True, index=True)
+    selected_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
+    saved_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     
     def __repr__(self):
-        return f'<Score {self.id} - User {self.user_id} - Quiz {self.quiz_id}>'
\ No newline at end of file
+        return f'<AttemptAnswer {self.attempt_id} - Question {self.question_id}>'
+
+class QuestionOutcome(db.Model):
+    __tablename__ = 'question_outcomes'
+    __table_args__ = (db.UniqueConstraint('attempt_id', 'question_id'),)
+
+    # One answer given in an adaptive attempt; kept after the attempt is
+    # archived, since every outcome feeds the question's difficulty
+    id = db.Column(db.Integer, primary_key=True)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('quiz_attempts.id', ondelete='SET NULL'))
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    selected_option = db.Column(db.Integer, nullable=False)  # 1, 2, 3, or 4
+    correct = db.Column(db.Boolean, nullable=False)
+    answered_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f'<QuestionOutcome {self.id} - Question {self.question_id}>'
+
+class ScoreArchive(db.Model):
+    __tablename__ = 'scores_archive'
+
+    # Scores moved out of the scores table by utils/archive.py, ids unchanged
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    timestamp_of_attempt = db.Column(db.DateTime)
+    total_score = db.Column(db.Integer, nullable=False)
+    accuracy_percentage = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ScoreArchive {self.id} - User {self.user_id} - Quiz {self.quiz_id}>'
+
+class ScoreRollup(db.Model):
+    __tablename__ = 'score_rollups'
+
+    # Lifetime totals of a user's archived scores on one quiz; keyed by quiz so
+    # they follow it to another chapter and are deleted with it
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), primary_key=True, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    accuracy_sum = db.Column(db.Float, nullable=False, default=0)
+    last_attempt_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ScoreRollup User {self.user_id} - Quiz {self.quiz_id}>'
+
+class ReplicaHeartbeat(db.Model):
+    __tablename__ = 'replica_heartbeat'
+    
+    # Single row rewritten on the primary; its age on a replica is the replication lag
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
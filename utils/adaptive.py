@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, QuestionOutcome
+from utils.attempts import adaptive_answers, served_answer_key, submit_attempt
+from utils.fragments import content_version, quiz_namespace, QUIZZES
+from utils.read_models import get_answer_key
+from utils.sharding import scatter
+
+# Questions served per adaptive attempt (fewer if the quiz has fewer)
+ADAPTIVE_QUESTION_COUNT = 10
+
+# Target difficulty moves this far up after a correct answer and down after a
+# wrong one, starting from the middle of the scale
+ADAPTIVE_STEP = 0.1
+
+# Seconds before an index is rebuilt to pick up outcomes recorded by other workers
+INDEX_TTL = 600
+
+class DifficultyIndex:
+    """
+    Questions of one quiz sorted by difficulty
+
+    Difficulty is the smoothed share of wrong answers, (wrong + 1) / (answers + 2),
+    so unanswered questions start at 0.5. Finding the question nearest a
+    target difficulty is a binary search, O(log n), plus a step past each
+    question the student has already seen.
+    """
+
+    def __init__(self, answer_key, stats, versions):
+        """
+        Args:
+            answer_key: Map of question id to correct option for the quiz
+            stats: Dict of question id to (answers, wrong answers)
+            versions: Content versions of the quiz the index was built from
+        """
+        self.answer_key = answer_key
+        self.versions = versions
+        self.built_at = time.monotonic()
+        self._stats = {question_id: stats.get(question_id, (0, 0)) for question_id in answer_key}
+        self._entries = sorted((self._difficulty(question_id), question_id) for question_id in self._stats)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _difficulty(self, question_id):
+        answers, wrong = self._stats[question_id]
+        return (wrong + 1) / (answers + 2)
+
+    def record(self, question_id, correct):
+        """Fold one new outcome into the index, keeping it sorted"""
+        if question_id not in self._stats:
+            return
+        entry = (self._difficulty(question_id), question_id)
+        del self._entries[bisect_left(self._entries, entry)]
+        answers, wrong = self._stats[question_id]
+        self._stats[question_id] = (answers + 1, wrong + (not correct))
+        insort(self._entries, (self._difficulty(question_id), question_id))
+
+    def nearest(self, target, exclude=()):
+        """Id of the question closest to the target difficulty that is not excluded, or None"""
+        right = bisect_left(self._entries, (target,))
+        left = right - 1
+        while left >= 0 or right < len(self._entries):
+            if right >= len(self._entries) or (
+                    left >= 0 and target - self._entries[left][0] <= self._entries[right][0] - target):
+                question_id = self._entries[left][1]
+                left -= 1
+            else:
+                question_id = self._entries[right][1]
+                right += 1
+            if question_id not in exclude:
+                return question_id
+        return None
+
+_indexes = {}
+_lock = threading.Lock()
+
+def _load_stats(question_ids):
+    """Answers and wrong answers per question, summed over every shard"""
+    def shard_stats():
+        return db.session.execute(
+            select(QuestionOutcome.question_id, func.count(),
+                   func.sum(case((QuestionOutcome.correct, 0), else_=1)))
+            .where(QuestionOutcome.question_id.in_(question_ids))
+            .group_by(QuestionOutcome.question_id)
+        ).all()
+
+    stats = {}
+    for rows in scatter(shard_stats):
+        for question_id, answers, wrong in rows:
+            total_answers, total_wrong = stats.get(question_id, (0, 0))
+            stats[question_id] = (total_answers + answers, total_wrong + wrong)
+    return stats
+
+def get_difficulty_index(quiz_id):
+    """
+    Difficulty index for a quiz, rebuilt when its questions change or it gets old
+
+    Only question ids and correct options are loaded, never the question text.
+    """
+    versions = (content_version(QUIZZES), content_version(quiz_namespace(quiz_id)))
+    with _lock:
+        index = _indexes.get(quiz_id)
+        if index is not None and index.versions == versions and time.monotonic() - index.built_at < INDEX_TTL:
+            return index
+
+    answer_key = get_answer_key(quiz_id)
+    index = DifficultyIndex(answer_key, _load_stats(list(answer_key)), versions)
+    with _lock:
+        _indexes[quiz_id] = index
+    return index
+
+def question_count(quiz_id):
+    """Questions served per adaptive attempt of a quiz"""
+    return min(ADAPTIVE_QUESTION_COUNT, len(get_difficulty_index(quiz_id)))
+
+def target_difficulty(answers, answer_key):
+    """Difficulty to aim the next question at, given the attempt's answers so far"""
+    correct = sum(1 for question_id, option in answers.items() if answer_key.get(question_id) == option)
+    wrong = len(answers) - correct
+    return min(max(0.5 + ADAPTIVE_STEP * (correct - wrong), 0.0), 1.0)
+
+def next_question(attempt, answers):
+    """
+    Pick the next question for an adaptive attempt
+
+    Args:
+        attempt: The open adaptive QuizAttempt
+        answers: {question_id: option} answered so far in the attempt
+
+    Returns:
+        Question id, or None once the attempt has been served enough questions
+    """
+    index = get_difficulty_index(attempt.quiz_id)
+    if len(answers) >= min(ADAPTIVE_QUESTION_COUNT, len(index)):
+        return None
+    target = target_difficulty(answers, index.answer_key)
+    with _lock:
+        return index.nearest(target, exclude=answers)
+
+def attempt_answers(attempt):
+    """Answers recorded so far for one adaptive attempt"""
+    return adaptive_answers([attempt.id])[attempt.id]
+
+def record_outcome(attempt, question_id, option, now=None):
+    """
+    Store the answer to a served question and update its difficulty
+
+    Returns:
+        False if the question had already been answered in this attempt
+    """
+    # Graded on the current key; the index's copy may be up to INDEX_TTL old
+    correct = get_answer_key(attempt.quiz_id).get(question_id) == option
+    db.session.add(QuestionOutcome(
+        attempt_id=attempt.id, question_id=question_id, user_id=attempt.user_id,
+        selected_option=option, correct=correct, answered_at=now or datetime.now()
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+    index = get_difficulty_index(attempt.quiz_id)
+    with _lock:
+        index.record(question_id, correct)
+    return True
+
+def finish_adaptive_attempt(attempt, now=None, auto_submitted=False):
+    """
+    Grade an adaptive attempt on the questions it was served
+
+    Returns:
+        The new Score, or None if the attempt had already been submitted
+    """
+    answers = attempt_answers(attempt)
+    answer_key = served_answer_key(get_answer_key(attempt.quiz_id), answers)
+    return submit_attempt(attempt, answers, now, auto_submitted, answer_key=answer_key)
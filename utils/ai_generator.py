@@ -1,4 +1,5 @@
 import random
+from utils.distractors import build_distractor_engine
 
 # Question templates and patterns for AI generation
 QUESTION_TEMPLATES = {
@@ -63,18 +64,38 @@ KNOWLEDGE_BASE = {
     }
 }
 
-def generate_mcq_questions(keywords, num_questions=5):
+# Knowledge-base section each question type draws its answers from
+ANSWER_CATEGORIES = {
+    'definition': 'definitions',
+    'characteristic': 'characteristics',
+    'application': 'applications',
+    'function': 'applications'
+}
+
+_distractor_engine = None
+
+def get_distractor_engine():
+    """Return the similarity-based distractor engine (None without numpy)"""
+    global _distractor_engine
+    if _distractor_engine is None:
+        _distractor_engine = build_distractor_engine(KNOWLEDGE_BASE)
+    return _distractor_engine
+
+def generate_mcq_questions(keywords, num_questions=5, similar_distractors=True):
     """
     Generate MCQ questions based on keywords using rule-based AI logic
     
     Args:
         keywords: String of comma-separated keywords or chapter name
         num_questions: Number of questions to generate
+        similar_distractors: Pick distractors by similarity to the correct answer
+            when numpy is available, instead of uniformly at random
     
     Returns:
         List of dictionaries containing question data
     """
     questions = []
+    answers = []
     keyword_list = [k.strip().lower() for k in keywords.split(',')]
     
     # If keywords not in knowledge base, use generic generation
@@ -104,9 +125,24 @@ def generate_mcq_questions(keywords, num_questions=5):
         
         if question_data:
             questions.append(question_data)
+            category = ANSWER_CATEGORIES.get(question_type, 'definitions')
+            answers.append((keyword, category, question_data['options'][question_data['correct'] - 1]))
+    
+    engine = get_distractor_engine() if similar_distractors else None
+    if engine is not None:
+        # One batched similarity pass for the whole run
+        for question_data, answer, distractors in zip(questions, answers, engine.select(answers)):
+            if len(distractors) == 3:
+                question_data['options'], question_data['correct'] = build_options(answer[2], distractors)
     
     return questions
 
+def build_options(correct_answer, distractors):
+    """Shuffle the correct answer among the distractors and return (options, correct_option)"""
+    options = [correct_answer] + distractors[:3]
+    random.shuffle(options)
+    return options, options.index(correct_answer) + 1
+
 def generate_definition_question(keyword):
     """Generate a definition-based question"""
     kb = KNOWLEDGE_BASE.get(keyword, KNOWLEDGE_BASE['python'])
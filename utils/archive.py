@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, QuizAttempt, Score, ScoreArchive, ScoreRollup
+from utils.scheduler import PeriodicWorker
+from utils.sharding import scatter
+
+# Scores moved to the archive per transaction
+ARCHIVE_BATCH_SIZE = 5000
+
+# Seconds between archival runs when SCORE_RETENTION_DAYS is set
+ARCHIVE_INTERVAL = 3600
+
+ARCHIVED_COLUMNS = ('id', 'quiz_id', 'user_id', 'timestamp_of_attempt', 'total_score', 'accuracy_percentage')
+
+def _roll_up(score_ids):
+    """Add a batch of scores to their users' per-quiz rollups"""
+    totals = select(
+        Score.user_id, Score.quiz_id, func.count(Score.id), func.sum(Score.total_score),
+        func.sum(Score.accuracy_percentage), func.max(Score.timestamp_of_attempt)
+    ).where(Score.id.in_(score_ids)) \
+     .group_by(Score.user_id, Score.quiz_id)
+
+    statement = insert(ScoreRollup).from_select(
+        ['user_id', 'quiz_id', 'attempts', 'total_score', 'accuracy_sum', 'last_attempt_at'], totals
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ScoreRollup.user_id, ScoreRollup.quiz_id],
+        set_={
+            'attempts': ScoreRollup.attempts + statement.excluded.attempts,
+            'total_score': ScoreRollup.total_score + statement.excluded.total_score,
+            'accuracy_sum': ScoreRollup.accuracy_sum + statement.excluded.accuracy_sum,
+            'last_attempt_at': func.max(ScoreRollup.last_attempt_at, statement.excluded.last_attempt_at)
+        }
+    )
+    db.session.execute(statement)
+
+def archive_batch(cutoff, limit=ARCHIVE_BATCH_SIZE):
+    """
+    Fold up to limit scores older than cutoff into the rollups and move them
+    to the archive, in one transaction
+
+    Returns:
+        Number of scores archived
+    """
+    score_ids = list(db.session.scalars(
+        select(Score.id).where(Score.timestamp_of_attempt < cutoff).order_by(Score.id).limit(limit)
+    ))
+    if not score_ids:
+        return 0
+
+    _roll_up(score_ids)
+    db.session.execute(insert(ScoreArchive).from_select(
+        ARCHIVED_COLUMNS,
+        select(*(getattr(Score, column) for column in ARCHIVED_COLUMNS)).where(Score.id.in_(score_ids))
+    ))
+    # Finished attempts (and their saved answers) go with their scores
+    db.session.execute(delete(QuizAttempt).where(QuizAttempt.score_id.in_(score_ids)))
+    db.session.execute(delete(Score).where(Score.id.in_(score_ids)))
+    db.session.commit()
+    return len(score_ids)
+
+def archive_scores(retention_days, now=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Archive every score older than retention_days, on the primary and every shard
+
+    Returns:
+        Number of scores archived
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+
+    def archive_partition():
+        total = 0
+        while True:
+            archived = archive_batch(cutoff, batch_size)
+            total += archived
+            if archived < batch_size:
+                return total
+
+    return sum(scatter(archive_partition))
+
+def start_archive_worker(app, interval=ARCHIVE_INTERVAL):
+    """Archive scores older than SCORE_RETENTION_DAYS every interval seconds, if set"""
+    retention_days = app.config.get('SCORE_RETENTION_DAYS')
+    if not retention_days:
+        return None
+
+    def tick():
+        with app.app_context():
+            archive_scores(retention_days)
+
+    worker = PeriodicWorker(interval, tick, name='score-archiver')
+    worker.start()
+    return worker
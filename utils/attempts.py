@@ -0,0 +1,298 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, QuestionOutcome, QuizAttempt, Score, User, new_attempt_token, parse_duration
+from utils.autosave import saved_answers, close_attempts
+from utils.leaderboard import record_score
+from utils.read_models import get_answer_key
+from utils.scheduler import DeadlineScheduler, PeriodicWorker
+from utils.sharding import group_by_shard, scatter, use_shard
+
+# Submissions arriving this long after the deadline are still graded normally
+SUBMISSION_GRACE = timedelta(seconds=30)
+
+# Expired attempts auto-submitted per scheduler tick, and seconds between ticks
+EXPIRY_BATCH_SIZE = 500
+EXPIRY_INTERVAL = 1.0
+
+# Finished attempts remembered so repeat submissions skip the database
+RECENT_SUBMISSIONS_SIZE = 10000
+
+# Open timed attempts keyed by id, due at deadline + grace
+scheduler = DeadlineScheduler()
+
+_recent_submissions = OrderedDict()
+_recent_lock = threading.Lock()
+
+def remember_submission(token, score_id):
+    """Record the score a submitted attempt token produced"""
+    if not token or score_id is None:
+        return
+    with _recent_lock:
+        _recent_submissions[token] = score_id
+        _recent_submissions.move_to_end(token)
+        while len(_recent_submissions) > RECENT_SUBMISSIONS_SIZE:
+            _recent_submissions.popitem(last=False)
+
+def recent_submission(token):
+    """Score id of a recently submitted attempt token, or None"""
+    with _recent_lock:
+        return _recent_submissions.get(token)
+
+def start_attempt(quiz_id, time_duration, user_id, now=None, adaptive=False):
+    """
+    Open a server-side attempt for a quiz, or resume the user's open one
+
+    Reloading the quiz page therefore does not restart the clock.
+
+    Args:
+        quiz_id: Quiz being started
+        time_duration: The quiz's HH:MM duration
+        user_id: Student starting the quiz
+        now: Current time (defaults to datetime.now())
+        adaptive: Open (or resume) an adaptive attempt instead of a standard one
+
+    Returns:
+        QuizAttempt
+    """
+    now = now or datetime.now()
+    attempt = QuizAttempt.query.filter(
+        QuizAttempt.quiz_id == quiz_id,
+        QuizAttempt.user_id == user_id,
+        QuizAttempt.submitted_at.is_(None),
+        QuizAttempt.adaptive.is_(True) if adaptive else QuizAttempt.adaptive.isnot(True)
+    ).order_by(QuizAttempt.started_at.desc()).first()
+
+    if attempt and (attempt.deadline is None or attempt.deadline > now):
+        if attempt.token is None:
+            # Opened before attempt tokens existed
+            attempt.token = new_attempt_token()
+            db.session.commit()
+        return attempt
+
+    duration = parse_duration(time_duration)
+    attempt = QuizAttempt(
+        quiz_id=quiz_id,
+        user_id=user_id,
+        started_at=now,
+        deadline=now + duration if duration else None,
+        adaptive=adaptive
+    )
+    db.session.add(attempt)
+    db.session.commit()
+
+    if attempt.deadline:
+        scheduler.schedule(attempt.id, attempt.deadline + SUBMISSION_GRACE)
+    return attempt
+
+def remaining_seconds(attempt, now=None):
+    """Whole seconds left on an attempt, or None for untimed quizzes"""
+    if attempt.deadline is None:
+        return None
+    now = now or datetime.now()
+    return max(int((attempt.deadline - now).total_seconds()), 0)
+
+def is_expired(attempt, now=None):
+    """Whether submissions for the attempt are past the deadline and grace period"""
+    now = now or datetime.now()
+    return attempt.deadline is not None and now > attempt.deadline + SUBMISSION_GRACE
+
+def answers_from_form(form):
+    """Extract {question_id: option} from submitted question_<id> fields"""
+    answers = {}
+    for key, value in form.items():
+        if key.startswith('question_'):
+            try:
+                answers[int(key[len('question_'):])] = int(value)
+            except ValueError:
+                continue
+    return answers
+
+def grade_answers(answer_key, answers):
+    """Number of answers matching the key"""
+    return sum(1 for question_id, correct in answer_key.items() if answers.get(question_id) == correct)
+
+def served_answer_key(answer_key, answers):
+    """The part of a quiz's answer key an adaptive attempt was graded on"""
+    return {question_id: answer_key[question_id] for question_id in answers if question_id in answer_key}
+
+def adaptive_answers(attempt_ids):
+    """
+    Answers recorded so far for adaptive attempts
+
+    Returns:
+        Dict of attempt id to {question_id: option}, in the order they were answered
+    """
+    answers = {attempt_id: {} for attempt_id in attempt_ids}
+    if not answers:
+        return answers
+    rows = db.session.execute(
+        select(QuestionOutcome.attempt_id, QuestionOutcome.question_id, QuestionOutcome.selected_option)
+        .where(QuestionOutcome.attempt_id.in_(answers))
+        .order_by(QuestionOutcome.id)
+    )
+    for attempt_id, question_id, option in rows:
+        answers[attempt_id][question_id] = option
+    return answers
+
+def _score_values(quiz_id, user_id, token, answer_key, answers, now):
+    correct_answers = grade_answers(answer_key, answers)
+    total_questions = len(answer_key)
+    return {
+        'quiz_id': quiz_id,
+        'user_id': user_id,
+        'attempt_token': token,
+        'timestamp_of_attempt': now,
+        'total_score': correct_answers,
+        'accuracy_percentage': (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    }
+
+def _claim(attempt_ids, now, auto_submitted):
+    """Mark open attempts submitted; returns the ids this call won"""
+    if not attempt_ids:
+        return []
+    result = db.session.execute(
+        update(QuizAttempt)
+        .where(QuizAttempt.id.in_(attempt_ids), QuizAttempt.submitted_at.is_(None))
+        .values(submitted_at=now, auto_submitted=auto_submitted)
+        .returning(QuizAttempt.id)
+        .execution_options(synchronize_session=False)
+    )
+    return [row[0] for row in result]
+
+def submit_attempt(attempt, answers, now=None, auto_submitted=False, answer_key=None):
+    """
+    Grade and close an attempt
+
+    The claim is a conditional UPDATE, so a manual submit racing the expiry
+    worker (or another worker process) grades the attempt exactly once.
+
+    Args:
+        answer_key: Questions to grade against (defaults to the whole quiz)
+
+    Returns:
+        The new Score, or None if the attempt had already been submitted
+    """
+    now = now or datetime.now()
+    if not _claim([attempt.id], now, auto_submitted):
+        db.session.rollback()
+        return None
+
+    if answer_key is None:
+        # Read fresh rather than from the quiz cache, which another worker's edit does not reach
+        answer_key = get_answer_key(attempt.quiz_id)
+    score = Score(**_score_values(attempt.quiz_id, attempt.user_id, attempt.token, answer_key, answers, now))
+    try:
+        db.session.add(score)
+        db.session.flush()
+    except IntegrityError:
+        # A score for this token already exists
+        db.session.rollback()
+        return None
+    db.session.execute(update(QuizAttempt), [{'id': attempt.id, 'score_id': score.id}])
+    db.session.commit()
+    db.session.refresh(attempt)
+
+    scheduler.cancel(attempt.id)
+    close_attempts([attempt.id])
+    remember_submission(attempt.token, score.id)
+    record_score(score, db.session.get(User, attempt.user_id).full_name)
+    return score
+
+def expire_attempts(attempt_ids, now=None):
+    """
+    Auto-submit a batch of expired attempts in one transaction
+
+    Returns:
+        Number of attempts submitted by this call
+    """
+    now = now or datetime.now()
+    claimed = _claim(attempt_ids, now, auto_submitted=True)
+    if not claimed:
+        db.session.commit()
+        return 0
+
+    rows = db.session.query(QuizAttempt.id, QuizAttempt.quiz_id, QuizAttempt.user_id, QuizAttempt.token,
+                            QuizAttempt.adaptive) \
+        .filter(QuizAttempt.id.in_(claimed)).all()
+
+    # Graded from whatever the student had autosaved (or, in adaptive mode,
+    # answered) before time ran out
+    answers = saved_answers([row.id for row in rows if not row.adaptive])
+    answers.update(adaptive_answers([row.id for row in rows if row.adaptive]))
+    answer_keys = {}
+    values = []
+    for attempt_id, quiz_id, user_id, token, adaptive in rows:
+        if quiz_id not in answer_keys:
+            answer_keys[quiz_id] = get_answer_key(quiz_id)
+        answer_key = answer_keys[quiz_id]
+        if adaptive:
+            answer_key = served_answer_key(answer_key, answers[attempt_id])
+        values.append(_score_values(quiz_id, user_id, token, answer_key, answers[attempt_id], now))
+
+    # One multi-row INSERT ... RETURNING instead of a flush per Score
+    score_ids = db.session.scalars(
+        insert(Score).returning(Score.id, sort_by_parameter_order=True), values
+    ).all()
+    db.session.execute(update(QuizAttempt), [
+        {'id': row.id, 'score_id': score_id} for row, score_id in zip(rows, score_ids)
+    ])
+    db.session.commit()
+    close_attempts(claimed)
+
+    names = dict(db.session.query(User.id, User.full_name)
+                 .filter(User.id.in_({row['user_id'] for row in values})).all())
+    for score_id, row in zip(score_ids, values):
+        remember_submission(row['attempt_token'], score_id)
+        record_score(Score(id=score_id, **row), names.get(row['user_id']))
+    return len(values)
+
+def expire_due_attempts(now=None, limit=EXPIRY_BATCH_SIZE):
+    """Auto-submit every attempt the scheduler reports as due, in batches"""
+    now = now or datetime.now()
+    total = 0
+    while True:
+        due = scheduler.pop_due(now, limit)
+        if not due:
+            return total
+        groups = list(group_by_shard(due).items())
+        for index, (key, attempt_ids) in enumerate(groups):
+            try:
+                with use_shard(key):
+                    total += expire_attempts(attempt_ids, now)
+            except Exception:
+                # pop_due already dropped these; put back every batch not yet
+                # submitted so the next tick retries them
+                db.session.rollback()
+                for _, pending in groups[index:]:
+                    for attempt_id in pending:
+                        scheduler.schedule(attempt_id, now)
+                raise
+
+def load_open_attempts():
+    """Rebuild the schedule from the database (e.g. after a restart)"""
+    def open_attempts():
+        return db.session.query(QuizAttempt.id, QuizAttempt.deadline).filter(
+            QuizAttempt.submitted_at.is_(None),
+            QuizAttempt.deadline.isnot(None)
+        ).all()
+
+    rows = [row for shard_rows in scatter(open_attempts) for row in shard_rows]
+    scheduler.load((attempt_id, deadline + SUBMISSION_GRACE) for attempt_id, deadline in rows)
+    return len(rows)
+
+def start_expiry_worker(app, interval=EXPIRY_INTERVAL):
+    """Load open attempts and start the background thread that auto-submits them"""
+    with app.app_context():
+        load_open_attempts()
+
+    def tick():
+        with app.app_context():
+            expire_due_attempts()
+
+    worker = PeriodicWorker(interval, tick, name='attempt-expiry')
+    worker.start()
+    return worker
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AttemptAnswer, QuizAttempt, Question
+from utils.read_models import get_answer_key
+from utils.scheduler import PeriodicWorker
+from utils.sharding import shard_for_id, use_shard
+
+# Seconds between autosave requests from the quiz page, and between flushes
+# of buffered answers to the database
+AUTOSAVE_CLIENT_INTERVAL = 5
+AUTOSAVE_FLUSH_INTERVAL = 2.0
+
+# Upper bound on answers accepted in a single autosave request
+MAX_DELTA_SIZE = 200
+
+VALID_OPTIONS = frozenset((1, 2, 3, 4))
+
+# Seconds before an attempt's context is reloaded to pick up questions other
+# workers added to or removed from its quiz
+CONTEXT_TTL = 60
+
+# What the autosave endpoint needs to validate a delta without touching the database
+AttemptContext = namedtuple('AttemptContext', ['id', 'quiz_id', 'user_id', 'deadline', 'question_ids'])
+
+class AnswerBuffer:
+    """
+    Latest unsaved answer per (attempt, question)
+
+    Repeated changes to the same question overwrite each other in memory, so a
+    flush writes one row per answered question no matter how often it changed.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(answers) for answers in self._pending.values())
+
+    def record(self, attempt_id, answers):
+        with self._lock:
+            self._pending.setdefault(attempt_id, {}).update(answers)
+
+    def pending(self, attempt_id):
+        """Unsaved answers for an attempt, including those mid-flush"""
+        with self._lock:
+            answers = dict(self._flushing.get(attempt_id, ()))
+            answers.update(self._pending.get(attempt_id, ()))
+            return answers
+
+    def drain(self):
+        """Hand everything buffered so far to a flush; call done() once it commits"""
+        with self._lock:
+            self._flushing, self._pending = self._pending, {}
+            return dict(self._flushing)
+
+    def done(self, failed=False):
+        """Finish a flush, putting the answers back if it failed"""
+        with self._lock:
+            flushing, self._flushing = self._flushing, {}
+            if failed:
+                for attempt_id, answers in flushing.items():
+                    current = self._pending.setdefault(attempt_id, {})
+                    for question_id, option in answers.items():
+                        current.setdefault(question_id, option)
+
+    def discard(self, attempt_ids):
+        with self._lock:
+            for attempt_id in attempt_ids:
+                self._pending.pop(attempt_id, None)
+                self._flushing.pop(attempt_id, None)
+
+buffer = AnswerBuffer()
+
+_contexts = {}
+_contexts_lock = threading.Lock()
+
+def get_attempt_context(attempt_id):
+    """
+    Cached details of an open attempt, or None if it is missing or submitted
+
+    Loaded once per CONTEXT_TTL, so steady-state autosaves do no database reads.
+    """
+    with _contexts_lock:
+        cached = _contexts.get(attempt_id)
+    if cached is not None and time.monotonic() - cached[1] < CONTEXT_TTL:
+        return cached[0]
+
+    attempt = db.session.get(QuizAttempt, attempt_id)
+    if attempt is None or not attempt.is_open():
+        return None
+
+    question_ids = frozenset(get_answer_key(attempt.quiz_id))
+    context = AttemptContext(attempt.id, attempt.quiz_id, attempt.user_id, attempt.deadline, question_ids)
+    with _contexts_lock:
+        _contexts[attempt_id] = (context, time.monotonic())
+    return context
+
+def parse_answers(context, raw_answers):
+    """
+    Validate a {question_id: option} delta against the attempt's quiz
+
+    Returns:
+        Dict of int question ids to int options; unknown questions and
+        invalid options are dropped
+    """
+    answers = {}
+    for question_id, option in list(raw_answers.items())[:MAX_DELTA_SIZE]:
+        try:
+            question_id, option = int(question_id), int(option)
+        except (TypeError, ValueError):
+            continue
+        if question_id in context.question_ids and option in VALID_OPTIONS:
+            answers[question_id] = option
+    return answers
+
+def record_answers(attempt_id, answers):
+    """Buffer an autosave delta; it reaches the database on the next flush"""
+    if answers:
+        buffer.record(attempt_id, answers)
+
+def _upsert(rows):
+    statement = insert(AttemptAnswer)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AttemptAnswer.attempt_id, AttemptAnswer.question_id],
+        set_={'selected_option': statement.excluded.selected_option, 'saved_at': statement.excluded.saved_at}
+    )
+    db.session.execute(statement, rows)
+    db.session.commit()
+
+def _drop_orphans(rows):
+    """Rows whose attempt and question still exist (either may be deleted mid-quiz)"""
+    attempt_ids = set(db.session.scalars(
+        select(QuizAttempt.id).where(QuizAttempt.id.in_({row['attempt_id'] for row in rows}))
+    ))
+    question_ids = set(db.session.scalars(
+        select(Question.id).where(Question.id.in_({row['question_id'] for row in rows}))
+    ))
+    return [row for row in rows if row['attempt_id'] in attempt_ids and row['question_id'] in question_ids]
+
+def flush_answers():
+    """
+    Write every buffered answer in one upsert per shard
+
+    Returns:
+        Number of answer rows written
+    """
+    pending = buffer.drain()
+    if not pending:
+        buffer.done()
+        return 0
+
+    now = datetime.now()
+    rows = [
+        {'attempt_id': attempt_id, 'question_id': question_id, 'selected_option': option, 'saved_at': now}
+        for attempt_id, answers in pending.items()
+        for question_id, option in answers.items()
+    ]
+    shard_rows = defaultdict(list)
+    for row in rows:
+        shard_rows[shard_for_id(row['attempt_id'])].append(row)
+    written = 0
+    try:
+        for key, rows in shard_rows.items():
+            with use_shard(key):
+                try:
+                    _upsert(rows)
+                except IntegrityError:
+                    db.session.rollback()
+                    rows = _drop_orphans(rows)
+                    if rows:
+                        _upsert(rows)
+            written += len(rows)
+    except Exception:
+        db.session.rollback()
+        buffer.done(failed=True)
+        raise
+    buffer.done()
+    return written
+
+def saved_answers(attempt_ids):
+    """
+    Answers saved so far for each attempt, including ones not yet flushed
+
+    Returns:
+        Dict of attempt id to {question_id: option}
+    """
+    attempt_ids = list(attempt_ids)
+    answers = {attempt_id: {} for attempt_id in attempt_ids}
+    if not attempt_ids:
+        return answers
+
+    rows = db.session.execute(
+        select(AttemptAnswer.attempt_id, AttemptAnswer.question_id, AttemptAnswer.selected_option)
+        .where(AttemptAnswer.attempt_id.in_(attempt_ids))
+    )
+    for attempt_id, question_id, option in rows:
+        answers[attempt_id][question_id] = option
+    for attempt_id in attempt_ids:
+        answers[attempt_id].update(buffer.pending(attempt_id))
+    return answers
+
+def close_attempts(attempt_ids):
+    """Forget buffered answers and cached context for submitted attempts"""
+    buffer.discard(attempt_ids)
+    with _contexts_lock:
+        for attempt_id in attempt_ids:
+            _contexts.pop(attempt_id, None)
+
+def start_autosave_worker(app, interval=AUTOSAVE_FLUSH_INTERVAL):
+    """Start the background thread that flushes buffered answers"""
+    def tick():
+        with app.app_context():
+            flush_answers()
+
+    worker = PeriodicWorker(interval, tick, name='autosave-flush')
+    worker.start()
+    return worker
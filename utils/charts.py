@@ -1,20 +1,172 @@
-from models import Score, Quiz, Chapter, Subject
-from sqlalchemy import func
+from models import db, Score, ScoreArchive, ScoreRollup, Quiz, Chapter, Subject, User
+from sqlalchemy import func, select, union_all
 from collections import defaultdict
+from utils.sharding import account_partitions, scatter
 
-def generate_performance_data(user_id):
+# SQLite strftime formats used to bucket the accuracy trend
+TREND_GRANULARITIES = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m'
+}
+
+DEFAULT_TREND_GRANULARITY = 'day'
+
+# Upper bound on points sent to the accuracy trend chart
+DEFAULT_TREND_POINTS = 200
+
+# Fewest points a client may ask for; LTTB needs both endpoints plus one bucket
+MIN_TREND_POINTS = 3
+
+def clamp_trend_points(points):
+    """Keep a requested number of trend points within [MIN_TREND_POINTS, DEFAULT_TREND_POINTS]"""
+    return min(max(points, MIN_TREND_POINTS), DEFAULT_TREND_POINTS)
+
+def get_accuracy_trend(user_id, granularity=DEFAULT_TREND_GRANULARITY, max_points=DEFAULT_TREND_POINTS,
+                       partitions=None):
+    """
+    Build the accuracy trend for a user, aggregated into time buckets in SQL
+    
+    Covers archived scores as well, so the trend spans the user's whole history.
+    
+    Args:
+        user_id: ID of the user
+        granularity: 'day', 'week' or 'month' (unknown values fall back to the default)
+        max_points: Downsample the series to at most this many points (None or 0 disables)
+        partitions: Partitions holding the user's scores (defaults to account_partitions)
+    
+    Returns:
+        List of dictionaries ordered by bucket
+    """
+    fmt = TREND_GRANULARITIES.get(granularity, TREND_GRANULARITIES[DEFAULT_TREND_GRANULARITY])
+    history = union_all(*(
+        select(
+            table.timestamp_of_attempt.label('timestamp'),
+            table.accuracy_percentage.label('accuracy'),
+            table.total_score.label('score')
+        ).where(table.user_id == user_id)
+        for table in (Score, ScoreArchive)
+    )).subquery()
+    bucket = func.strftime(fmt, history.c.timestamp)
+    
+    query = db.session.query(
+        bucket.label('bucket'),
+        func.sum(history.c.accuracy),
+        func.sum(history.c.score),
+        func.count()
+    ).group_by(bucket)
+    
+    # Buckets are summed across partitions, then averaged
+    buckets = defaultdict(lambda: [0, 0, 0])
+    for rows in scatter(query.all, partitions or account_partitions(user_id)):
+        for key, accuracy_sum, score_sum, count in rows:
+            totals = buckets[key]
+            totals[0] += accuracy_sum or 0
+            totals[1] += score_sum or 0
+            totals[2] += count
+    
+    trend = [{
+        'date': key,
+        'accuracy': round(accuracy_sum / count, 2) if count else 0,
+        'score': score_sum,
+        'attempts': count
+    } for key, (accuracy_sum, score_sum, count) in sorted(buckets.items(), key=lambda item: item[0] or '')]
+    
+    if max_points:
+        trend = downsample_lttb(trend, max_points)
+    
+    return trend
+
+def downsample_lttb(points, threshold, key='accuracy'):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets
+    
+    Keeps the first and last points and, for every bucket in between, the point
+    forming the largest triangle with its neighbours, so peaks and dips survive.
+    
+    Args:
+        points: List of dictionaries ordered along the x axis
+        threshold: Maximum number of points to keep
+        key: Dictionary key holding the y value
+    
+    Returns:
+        List containing at most threshold points
+    """
+    n = len(points)
+    if threshold >= n or n <= 2:
+        return points
+    if threshold < 3:
+        # No room for a middle bucket: keep only the endpoints
+        return [points[0], points[-1]]
+    
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average of the next bucket acts as the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_count = next_end - next_start
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(p[key] for p in points[next_start:next_end]) / next_count
+        
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = a, points[a][key]
+        
+        max_area = -1
+        chosen = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][key] - ay) - (ax - j) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                chosen = j
+        
+        sampled.append(points[chosen])
+        a = chosen
+    
+    sampled.append(points[-1])
+    return sampled
+
+def generate_performance_data(user_id, granularity=DEFAULT_TREND_GRANULARITY, max_points=DEFAULT_TREND_POINTS):
     """
     Generate comprehensive performance analytics data for a user
     
     Args:
         user_id: ID of the user
+        granularity: Time bucket for the accuracy trend ('day', 'week' or 'month')
+        max_points: Maximum number of accuracy trend points
     
     Returns:
         Dictionary containing various performance metrics
     """
-    scores = Score.query.filter_by(user_id=user_id).all()
+    # A student's scores live on their shard, plus any made on the primary
+    # before sharding was enabled
+    return _performance_data(user_id, granularity, max_points, account_partitions(user_id))
+
+def _performance_data(user_id, granularity, max_points, partitions):
+    # Only the columns the charts use, with subject and chapter names joined in,
+    # rather than a Score object per attempt lazy-loading its quiz and chapter
+    score_statement = (
+        select(Score.quiz_id, Score.timestamp_of_attempt, Score.total_score, Score.accuracy_percentage,
+               Subject.name.label('subject_name'), Chapter.name.label('chapter_name'))
+        .join(Quiz, Score.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+        .where(Score.user_id == user_id)
+    )
+    # Archived scores are counted from their per-quiz totals
+    rollup_query = db.session.query(
+        Subject.name, Chapter.name, ScoreRollup.attempts, ScoreRollup.total_score, ScoreRollup.accuracy_sum
+    ).join(Quiz, ScoreRollup.quiz_id == Quiz.id) \
+     .join(Chapter, Quiz.chapter_id == Chapter.id) \
+     .join(Subject, Chapter.subject_id == Subject.id) \
+     .filter(ScoreRollup.user_id == user_id)
+    scores = [row for rows in scatter(lambda: db.session.execute(score_statement).all(), partitions) for row in rows]
+    rollups = [row for rows in scatter(rollup_query.all, partitions) for row in rows]
     
-    if not scores:
+    if not scores and not rollups:
         return {
             'overall_accuracy': 0,
             'total_quizzes': 0,
@@ -26,28 +178,26 @@ def generate_performance_data(user_id):
         }
     
     # Calculate overall metrics
-    total_quizzes = len(scores)
-    total_accuracy = sum(s.accuracy_percentage for s in scores)
+    total_quizzes = len(scores) + sum(r.attempts for r in rollups)
+    total_accuracy = sum(s.accuracy_percentage for s in scores) + sum(r.accuracy_sum for r in rollups)
     overall_accuracy = total_accuracy / total_quizzes if total_quizzes > 0 else 0
-    total_score = sum(s.total_score for s in scores)
+    total_score = sum(s.total_score for s in scores) + sum(r.total_score for r in rollups)
     
     # Accuracy trend over time
-    accuracy_trend = []
-    for score in sorted(scores, key=lambda x: x.timestamp_of_attempt):
-        accuracy_trend.append({
-            'date': score.timestamp_of_attempt.strftime('%Y-%m-%d'),
-            'accuracy': round(score.accuracy_percentage, 2),
-            'score': score.total_score
-        })
+    accuracy_trend = get_accuracy_trend(user_id, granularity, max_points, partitions)
     
     # Subject-wise performance
     subject_scores = defaultdict(lambda: {'total_accuracy': 0, 'count': 0, 'total_score': 0})
     
     for score in scores:
-        subject = score.quiz.chapter.subject
-        subject_scores[subject.name]['total_accuracy'] += score.accuracy_percentage
-        subject_scores[subject.name]['count'] += 1
-        subject_scores[subject.name]['total_score'] += score.total_score
+        subject_scores[score.subject_name]['total_accuracy'] += score.accuracy_percentage
+        subject_scores[score.subject_name]['count'] += 1
+        subject_scores[score.subject_name]['total_score'] += score.total_score
+    
+    for subject_name, _, attempts, rollup_score, accuracy_sum in rollups:
+        subject_scores[subject_name]['total_accuracy'] += accuracy_sum
+        subject_scores[subject_name]['count'] += attempts
+        subject_scores[subject_name]['total_score'] += rollup_score
     
     subject_performance = []
     for subject_name, data in subject_scores.items():
@@ -66,10 +216,14 @@ def generate_performance_data(user_id):
     chapter_scores = defaultdict(lambda: {'total_accuracy': 0, 'count': 0, 'total_score': 0})
     
     for score in scores:
-        chapter = score.quiz.chapter
-        chapter_scores[chapter.name]['total_accuracy'] += score.accuracy_percentage
-        chapter_scores[chapter.name]['count'] += 1
-        chapter_scores[chapter.name]['total_score'] += score.total_score
+        chapter_scores[score.chapter_name]['total_accuracy'] += score.accuracy_percentage
+        chapter_scores[score.chapter_name]['count'] += 1
+        chapter_scores[score.chapter_name]['total_score'] += score.total_score
+    
+    for _, chapter_name, attempts, rollup_score, accuracy_sum in rollups:
+        chapter_scores[chapter_name]['total_accuracy'] += accuracy_sum
+        chapter_scores[chapter_name]['count'] += attempts
+        chapter_scores[chapter_name]['total_score'] += rollup_score
     
     chapter_performance = []
     for chapter_name, data in chapter_scores.items():
@@ -93,8 +247,8 @@ def generate_performance_data(user_id):
     for score in sorted(scores, key=lambda x: x.timestamp_of_attempt, reverse=True)[:10]:
         recent_attempts.append({
             'quiz_id': score.quiz_id,
-            'subject': score.quiz.chapter.subject.name,
-            'chapter': score.quiz.chapter.name,
+            'subject': score.subject_name,
+            'chapter': score.chapter_name,
             'date': score.timestamp_of_attempt.strftime('%Y-%m-%d %H:%M'),
             'score': score.total_score,
             'accuracy': round(score.accuracy_percentage, 2)
@@ -112,57 +266,87 @@ def generate_performance_data(user_id):
         'recent_attempts': recent_attempts
     }
 
+def _shard_analytics():
+    """Score aggregates for the current shard"""
+    count, accuracy_sum = db.session.query(
+        func.count(Score.id), func.sum(Score.accuracy_percentage)
+    ).one()
+    archived_count, archived_accuracy_sum = db.session.query(
+        func.sum(ScoreRollup.attempts), func.sum(ScoreRollup.accuracy_sum)
+    ).one()
+
+    subject_attempts = db.session.query(
+        Subject.name, func.count(Score.id)
+    ).join(Chapter, Chapter.subject_id == Subject.id) \
+     .join(Quiz, Quiz.chapter_id == Chapter.id) \
+     .join(Score, Score.quiz_id == Quiz.id) \
+     .group_by(Subject.id).all()
+    subject_attempts += db.session.query(
+        Subject.name, func.sum(ScoreRollup.attempts)
+    ).join(Chapter, Chapter.subject_id == Subject.id) \
+     .join(Quiz, Quiz.chapter_id == Chapter.id) \
+     .join(ScoreRollup, ScoreRollup.quiz_id == Quiz.id) \
+     .group_by(Subject.id).all()
+
+    recent_scores = db.session.execute(
+        select(Score.timestamp_of_attempt, Score.total_score, Score.accuracy_percentage,
+               User.full_name, Subject.name.label('subject_name'), Chapter.name.label('chapter_name'))
+        .join(User, Score.user_id == User.id)
+        .join(Quiz, Score.quiz_id == Quiz.id)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .join(Subject, Chapter.subject_id == Subject.id)
+        .order_by(Score.timestamp_of_attempt.desc()).limit(10)
+    ).all()
+    recent_activity = [(score.timestamp_of_attempt, {
+        'user': score.full_name,
+        'quiz': f"{score.subject_name} - {score.chapter_name}",
+        'score': score.total_score,
+        'accuracy': round(score.accuracy_percentage, 2),
+        'date': score.timestamp_of_attempt.strftime('%Y-%m-%d %H:%M')
+    }) for score in recent_scores]
+
+    return (count + (archived_count or 0), (accuracy_sum or 0) + (archived_accuracy_sum or 0),
+            subject_attempts, recent_activity)
+
 def get_admin_analytics():
     """
     Generate analytics for admin dashboard
     
+    Score aggregates (archived scores included) are computed on every shard
+    and merged; the content counts come from the primary.
+    
     Returns:
         Dictionary containing platform-wide statistics
     """
-    from models import User, Subject, Chapter, Quiz, Question, Score
+    from models import Question
     
     total_users = User.query.filter_by(is_admin=False).count()
     total_subjects = Subject.query.count()
     total_chapters = Chapter.query.count()
     total_quizzes = Quiz.query.count()
     total_questions = Question.query.count()
-    total_attempts = Score.query.count()
+    
+    total_attempts = 0
+    accuracy_sum = 0
+    subject_attempts = defaultdict(int)
+    recent_activity = []
+    for count, shard_accuracy_sum, subjects, activity in scatter(_shard_analytics):
+        total_attempts += count
+        accuracy_sum += shard_accuracy_sum
+        for name, attempts in subjects:
+            subject_attempts[name] += attempts
+        recent_activity.extend(activity)
     
     # Average platform accuracy
-    avg_accuracy = Score.query.with_entities(
-        func.avg(Score.accuracy_percentage)
-    ).scalar() or 0
+    avg_accuracy = accuracy_sum / total_attempts if total_attempts else 0
     
     # Most popular subjects (by quiz attempts)
-    popular_subjects = []
-    subjects = Subject.query.all()
-    
-    for subject in subjects:
-        attempts = 0
-        for chapter in subject.chapters:
-            for quiz in chapter.quizzes:
-                attempts += len(quiz.scores)
-        
-        if attempts > 0:
-            popular_subjects.append({
-                'name': subject.name,
-                'attempts': attempts
-            })
-    
+    popular_subjects = [{'name': name, 'attempts': attempts} for name, attempts in subject_attempts.items()]
     popular_subjects.sort(key=lambda x: x['attempts'], reverse=True)
     
     # Recent activity
-    recent_scores = Score.query.order_by(Score.timestamp_of_attempt.desc()).limit(10).all()
-    recent_activity = []
-    
-    for score in recent_scores:
-        recent_activity.append({
-            'user': score.user.full_name,
-            'quiz': f"{score.quiz.chapter.subject.name} - {score.quiz.chapter.name}",
-            'score': score.total_score,
-            'accuracy': round(score.accuracy_percentage, 2),
-            'date': score.timestamp_of_attempt.strftime('%Y-%m-%d %H:%M')
-        })
+    recent_activity.sort(key=lambda item: item[0], reverse=True)
+    recent_activity = [activity for _, activity in recent_activity[:10]]
     
     return {
         'total_users': total_users,
@@ -174,4 +358,12 @@ def get_admin_analytics():
         'average_accuracy': round(avg_accuracy, 2),
         'popular_subjects': popular_subjects[:5],
         'recent_activity': recent_activity
-    }
\ No newline at end of file
+    }
+
+def count_attempts():
+    """Total number of scores across every shard, archived ones included"""
+    def shard_count():
+        archived = db.session.query(func.sum(ScoreRollup.attempts)).scalar() or 0
+        return Score.query.count() + archived
+
+    return sum(scatter(shard_count))
@@ -0,0 +1,222 @@
+import hashlib
+import operator
+import re
+import struct
+import threading
+from collections import defaultdict
+
+from models import db, Question
+
+# MinHash signature length, split into LSH bands of BAND_ROWS values each
+# (10 bands of 6 rows: ~70% recall at similarity 0.7, ~93% at 0.8, and questions
+# sharing only boilerplate wording rarely collide)
+NUM_PERMUTATIONS = 60
+BAND_ROWS = 6
+NUM_BANDS = NUM_PERMUTATIONS // BAND_ROWS
+
+# Estimated Jaccard similarity at which two questions count as near-duplicates
+DUPLICATE_THRESHOLD = 0.7
+
+# Each 16-bit slice of one SHAKE-128 digest serves as an independent hash function
+_DIGEST_SIZE = NUM_PERMUTATIONS * 2
+_DIGEST_FORMAT = struct.Struct(f'<{NUM_PERMUTATIONS}H')
+
+def shingles(statement, options=()):
+    """
+    Normalized features of a question
+
+    Word bigrams of the statement plus each option as a whole, so reordered
+    options and changes in case or punctuation do not hide a duplicate.
+    """
+    words = re.findall(r'\w+', (statement or '').lower())
+    features = {f'{a} {b}' for a, b in zip(words, words[1:])} or set(words)
+    for option in options:
+        option_words = re.findall(r'\w+', (option or '').lower())
+        if option_words:
+            features.add('opt:' + ' '.join(option_words))
+    return features
+
+def minhash_signature(features):
+    """MinHash signature of a feature set (NUM_PERMUTATIONS values)"""
+    if not features:
+        return (0,) * NUM_PERMUTATIONS
+    rows = [
+        _DIGEST_FORMAT.unpack(hashlib.shake_128(feature.encode('utf-8')).digest(_DIGEST_SIZE))
+        for feature in features
+    ]
+    return tuple(map(min, zip(*rows)))
+
+def question_signature(statement, options):
+    return minhash_signature(shingles(statement, options))
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(map(operator.eq, signature_a, signature_b)) / NUM_PERMUTATIONS
+
+def _band_keys(signature):
+    return [
+        (band, signature[band * BAND_ROWS:(band + 1) * BAND_ROWS])
+        for band in range(NUM_BANDS)
+    ]
+
+class DuplicateIndex:
+    """
+    Locality-sensitive hashing index over question MinHash signatures
+
+    Questions sharing any band of their signature land in the same bucket, so a
+    lookup only compares against a handful of candidates instead of the whole bank.
+    """
+
+    def __init__(self):
+        self.signatures = {}
+        self.buckets = defaultdict(set)
+
+    def add(self, question_id, signature):
+        self.remove(question_id)
+        self.signatures[question_id] = signature
+        for key in _band_keys(signature):
+            self.buckets[key].add(question_id)
+
+    def remove(self, question_id):
+        signature = self.signatures.pop(question_id, None)
+        if signature is None:
+            return
+        for key in _band_keys(signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(question_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def candidates(self, signature):
+        found = set()
+        for key in _band_keys(signature):
+            found.update(self.buckets.get(key, ()))
+        return found
+
+    def query(self, signature, threshold=DUPLICATE_THRESHOLD, exclude_id=None):
+        """Return (question_id, similarity) pairs above the threshold, most similar first"""
+        matches = []
+        for question_id in self.candidates(signature):
+            if question_id == exclude_id:
+                continue
+            score = similarity(signature, self.signatures[question_id])
+            if score >= threshold:
+                matches.append((question_id, round(score, 2)))
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches
+
+_index = None
+_lock = threading.Lock()
+
+def _load_index():
+    index = DuplicateIndex()
+    rows = db.session.query(
+        Question.id, Question.question_statement,
+        Question.option1, Question.option2, Question.option3, Question.option4
+    ).yield_per(1000)
+    for question_id, statement, *options in rows:
+        index.add(question_id, question_signature(statement, options))
+    return index
+
+def get_duplicate_index():
+    """Return the bank-wide duplicate index, building it on first use"""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = _load_index()
+        return _index
+
+def find_duplicates(statement, options, exclude_id=None, threshold=DUPLICATE_THRESHOLD):
+    """
+    Find existing questions that are near-duplicates of the given text
+
+    Args:
+        statement: Question statement
+        options: The four option texts
+        exclude_id: Question to ignore (the one being edited)
+        threshold: Minimum estimated similarity
+
+    Returns:
+        List of (question_id, similarity) pairs, most similar first
+    """
+    index = get_duplicate_index()
+    signature = question_signature(statement, options)
+    with _lock:
+        return index.query(signature, threshold, exclude_id)
+
+def index_question(question):
+    """Add or refresh a committed question in the duplicate index"""
+    signature = question_signature(
+        question.question_statement,
+        [question.option1, question.option2, question.option3, question.option4]
+    )
+    with _lock:
+        if _index is not None:
+            _index.add(question.id, signature)
+
+def unindex_question(question_id):
+    unindex_questions([question_id])
+
+def unindex_questions(question_ids):
+    """Remove questions from the index, e.g. those a cascading delete is about to drop"""
+    with _lock:
+        if _index is not None:
+            for question_id in question_ids:
+                _index.remove(question_id)
+
+def start_index_builder(app):
+    """Build the duplicate index in the background so no request waits for it"""
+    def build():
+        with app.app_context():
+            get_duplicate_index()
+
+    thread = threading.Thread(target=build, name='duplicate-index-builder', daemon=True)
+    thread.start()
+    return thread
+
+def build_duplicate_report(threshold=DUPLICATE_THRESHOLD):
+    """
+    Group the whole question bank into clusters of near-duplicates
+
+    Candidate pairs come from shared LSH buckets and are confirmed by signature
+    similarity; clusters are the connected components of confirmed pairs.
+
+    Returns:
+        List of clusters (sorted lists of question ids), largest first
+    """
+    index = get_duplicate_index()
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    with _lock:
+        for bucket in index.buckets.values():
+            if len(bucket) < 2:
+                continue
+            # Compare each member against one representative per cluster seen in
+            # this bucket, so buckets full of identical questions stay linear
+            representatives = []
+            for question_id in sorted(bucket):
+                signature = index.signatures[question_id]
+                for representative in representatives:
+                    if similarity(signature, index.signatures[representative]) >= threshold:
+                        root_a, root_b = find(representative), find(question_id)
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+                        break
+                else:
+                    representatives.append(question_id)
+
+    clusters = defaultdict(list)
+    for question_id in parent:
+        clusters[find(question_id)].append(question_id)
+
+    groups = [sorted(members) for members in clusters.values() if len(members) > 1]
+    groups.sort(key=len, reverse=True)
+    return groups
@@ -0,0 +1,142 @@
+import re
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; callers fall back to random distractors
+    np = None
+
+# Width of the hashed bag-of-words vectors
+HASH_DIMENSIONS = 256
+
+# Cosine similarity band for good distractors: related to the answer, but not a paraphrase
+SIMILARITY_BAND = (0.05, 0.8)
+
+# Random noise added to the best candidates' similarities so repeated runs vary
+SELECTION_JITTER = 0.05
+
+# Candidates kept per distractor slot before jitter and de-duplication
+CANDIDATES_PER_DISTRACTOR = 4
+
+def _tokens(text):
+    return re.findall(r'\w+', text.lower())
+
+class DistractorEngine:
+    """
+    Similarity-based distractor selection over a knowledge base
+
+    Every knowledge-base entry is embedded once as an L2-normalized, TF-IDF weighted
+    hashed bag-of-words vector. A generation run scores all of its correct answers
+    against the entries of their category with one matrix product per category and
+    picks, per question, entries from other topics that fall in SIMILARITY_BAND.
+    """
+
+    def __init__(self, knowledge_base, seed=None):
+        self.texts = []
+        topics = []
+        categories = []
+        self.topic_ids = {}
+        self.category_ids = {}
+
+        for topic, sections in knowledge_base.items():
+            topic_id = self.topic_ids.setdefault(topic, len(self.topic_ids))
+            for category, entries in sections.items():
+                category_id = self.category_ids.setdefault(category, len(self.category_ids))
+                for entry in entries:
+                    self.texts.append(entry)
+                    topics.append(topic_id)
+                    categories.append(category_id)
+
+        self.positions = {}
+        for i, (text, topic_id, category_id) in enumerate(zip(self.texts, topics, categories)):
+            self.positions.setdefault((text, topic_id, category_id), i)
+
+        self.topics = np.array(topics, dtype=np.int32)
+        self.vectors = self._embed(self.texts)
+        self.rng = np.random.default_rng(seed)
+
+        # Distractors always share the answer's category, so keep one block per category
+        categories = np.array(categories, dtype=np.int32)
+        self.category_rows = {
+            category_id: np.flatnonzero(categories == category_id)
+            for category_id in self.category_ids.values()
+        }
+        self.category_vectors = {
+            category_id: np.ascontiguousarray(self.vectors[rows])
+            for category_id, rows in self.category_rows.items()
+        }
+
+    def _embed(self, texts):
+        counts = np.zeros((len(texts), HASH_DIMENSIONS), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in _tokens(text):
+                counts[row, zlib.crc32(token.encode('utf-8')) % HASH_DIMENSIONS] += 1
+
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+        vectors = counts * idf.astype(np.float32)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def select(self, answers, count=3):
+        """
+        Pick distractors for a batch of questions
+
+        Args:
+            answers: List of (topic, category, correct_answer) tuples from the knowledge base
+            count: Distractors per question
+
+        Returns:
+            List of distractor lists, aligned with answers
+        """
+        selected = [[] for _ in answers]
+        by_category = {}
+        for i, (topic, category, text) in enumerate(answers):
+            category_id = self.category_ids[category]
+            by_category.setdefault(category_id, []).append(
+                (i, self.positions[(text, self.topic_ids[topic], category_id)])
+            )
+
+        low, high = SIMILARITY_BAND
+        for category_id, group in by_category.items():
+            indices = [i for i, _ in group]
+            rows = np.array([row for _, row in group])
+            block_rows = self.category_rows[category_id]
+
+            # One (questions x entries) similarity matrix per category in the run
+            similarity = self.vectors[rows] @ self.category_vectors[category_id].T
+
+            eligible = self.topics[block_rows][None, :] != self.topics[rows][:, None]
+            in_band = (similarity >= low) & (similarity <= high)
+
+            # In-band entries rank first, other eligible entries are the fallback
+            score = np.where(eligible, np.where(in_band, similarity, similarity - 2.0), -np.inf)
+
+            k = min(count * CANDIDATES_PER_DISTRACTOR, score.shape[1])
+            top = np.argpartition(-score, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(score, top, axis=1)
+            top_scores = top_scores + self.rng.uniform(0, SELECTION_JITTER, top_scores.shape)
+            order = np.argsort(-top_scores, axis=1)
+
+            for n, i in enumerate(indices):
+                answer = answers[i][2]
+                distractors = []
+                for j in order[n]:
+                    if not np.isfinite(top_scores[n, j]):
+                        break
+                    text = self.texts[block_rows[top[n, j]]]
+                    if text != answer and text not in distractors:
+                        distractors.append(text)
+                        if len(distractors) == count:
+                            break
+                selected[i] = distractors
+
+        return selected
+
+def build_distractor_engine(knowledge_base, seed=None):
+    """Return a DistractorEngine, or None when numpy is not installed"""
+    if np is None:
+        return None
+    return DistractorEngine(knowledge_base, seed=seed)
@@ -0,0 +1,112 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select, union_all
+
+from models import db, Score, ScoreArchive, User, Quiz, Chapter, Subject
+from utils.sharding import partitions, use_shard
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    'score_id', 'user_id', 'username', 'full_name', 'quiz_id', 'quiz_date',
+    'chapter', 'subject', 'timestamp', 'total_score', 'accuracy_percentage'
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson'
+}
+
+def build_export_query(start_date=None, end_date=None, subject_id=None, quiz_id=None):
+    """
+    Build a column-only query over scores joined with their user, quiz, chapter and subject
+
+    Archived scores are included, so a date range past the retention horizon
+    still exports its attempts.
+
+    Args:
+        start_date: Include attempts on or after this date
+        end_date: Include attempts on or before this date
+        subject_id: Restrict to a subject
+        quiz_id: Restrict to a quiz
+
+    Returns:
+        SQLAlchemy query streaming rows in score id order
+    """
+    # Filter each table before the union so the timestamp and quiz indexes are used
+    branches = []
+    for table in (Score, ScoreArchive):
+        branch = select(table.id, table.user_id, table.quiz_id, table.timestamp_of_attempt,
+                        table.total_score, table.accuracy_percentage)
+        if start_date:
+            branch = branch.where(table.timestamp_of_attempt >= datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            branch = branch.where(table.timestamp_of_attempt < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        if quiz_id:
+            branch = branch.where(table.quiz_id == quiz_id)
+        branches.append(branch)
+    scores = union_all(*branches).subquery()
+
+    query = db.session.query(
+        scores.c.id, User.id, User.username, User.full_name, Quiz.id, Quiz.date_of_quiz,
+        Chapter.name, Subject.name, scores.c.timestamp_of_attempt, scores.c.total_score,
+        scores.c.accuracy_percentage
+    ).select_from(scores) \
+     .join(User, scores.c.user_id == User.id) \
+     .join(Quiz, scores.c.quiz_id == Quiz.id) \
+     .join(Chapter, Quiz.chapter_id == Chapter.id) \
+     .join(Subject, Chapter.subject_id == Subject.id)
+
+    if subject_id:
+        query = query.filter(Subject.id == subject_id)
+
+    # Archived scores keep their ids, so both tables interleave in attempt order
+    return query.order_by(scores.c.id)
+
+def _partitions(query):
+    """Iterate over batches of rows from a server-side cursor on each shard in turn"""
+    statement = query.statement.execution_options(yield_per=EXPORT_BATCH_SIZE)
+    # Shards allocate ids from ascending ranges, so rows stay in score id order
+    for key in partitions():
+        with use_shard(key):
+            result = db.session.execute(statement)
+        yield from result.partitions()
+
+def _row_values(row):
+    values = list(row)
+    values[5] = values[5].isoformat() if values[5] else None
+    values[8] = values[8].isoformat() if values[8] else None
+    return values
+
+def stream_scores_csv(query):
+    """Yield the export as CSV text, one chunk per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # Send the header before the first batch is fetched
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for rows in _partitions(query):
+        buffer.seek(0)
+        buffer.truncate(0)
+        for row in rows:
+            writer.writerow(_row_values(row))
+        yield buffer.getvalue()
+
+def stream_scores_jsonl(query):
+    """Yield the export as JSON Lines, one chunk per fetched batch"""
+    for rows in _partitions(query):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row)))) + '\n'
+            for row in rows
+        )
+
+def stream_scores(query, export_format='csv'):
+    """Dispatch to the streaming writer for the requested format"""
+    if export_format == 'jsonl':
+        return stream_scores_jsonl(query)
+    return stream_scores_csv(query)
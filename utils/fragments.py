@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# Rendered fragments kept in memory (least recently used are evicted first)
+FRAGMENT_CACHE_SIZE = 2000
+
+# Seconds before a fragment is re-rendered anyway; versions are bumped only in
+# the worker that made the edit, so this bounds how long other workers serve
+# stale content
+FRAGMENT_TTL = 300
+
+# Content namespaces fragments can depend on
+CATALOG = 'catalog'    # subjects and chapters
+QUIZZES = 'quizzes'    # every quiz; per-quiz namespaces are quiz_namespace(id)
+
+_versions = {}
+_fragments = OrderedDict()
+_lock = threading.Lock()
+
+def quiz_namespace(quiz_id):
+    return f'quiz:{quiz_id}'
+
+def content_version(namespace):
+    """Current version of a content namespace"""
+    with _lock:
+        return _versions.get(namespace, 0)
+
+def bump_version(*namespaces):
+    """
+    Mark content as changed
+
+    Fragments rendered against an older version are never served again and
+    age out of the cache.
+    """
+    with _lock:
+        for namespace in namespaces:
+            _versions[namespace] = _versions.get(namespace, 0) + 1
+
+def cached_fragment(template_name, namespaces, load_context, key=None):
+    """
+    Render a user-independent template fragment once per content version
+
+    A fragment is also re-rendered once it is FRAGMENT_TTL seconds old.
+
+    Args:
+        template_name: Fragment template to render
+        namespaces: Content namespaces the fragment depends on
+        load_context: Callable returning the template context; only called
+            when the fragment has to be rendered
+        key: Extra key for fragments rendered per object (e.g. a quiz id)
+
+    Returns:
+        Markup
+    """
+    with _lock:
+        versions = tuple(_versions.get(namespace, 0) for namespace in namespaces)
+        cache_key = (template_name, key, versions)
+        cached = _fragments.get(cache_key)
+        if cached is not None and time.monotonic() - cached[1] < FRAGMENT_TTL:
+            _fragments.move_to_end(cache_key)
+            return cached[0]
+
+    html = Markup(render_template(template_name, **load_context()))
+    with _lock:
+        _fragments[cache_key] = (html, time.monotonic())
+        _fragments.move_to_end(cache_key)
+        while len(_fragments) > FRAGMENT_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return html
+
+def clear_fragments():
+    with _lock:
+        _fragments.clear()
+
+def enable_bytecode_cache(app):
+    """
+    Store compiled templates on disk so new workers skip Jinja compilation
+
+    Must run before the first template is rendered.
+    """
+    directory = os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,141 @@
+import heapq
+import threading
+import time
+from sqlalchemy import func, case, cast, select, union_all, Integer
+
+from models import db, Score, ScoreArchive, User
+from utils.sharding import scatter
+
+# Number of entries kept on each quiz leaderboard
+LEADERBOARD_SIZE = 10
+
+# Accuracy histogram resolution (20 bins of 5% each)
+HISTOGRAM_BINS = 20
+
+# Seconds before a leaderboard is reloaded, to pick up scores recorded by
+# other workers
+LEADERBOARD_TTL = 300
+
+def accuracy_bin(accuracy):
+    """Map an accuracy percentage to its histogram bin"""
+    return min(max(int(accuracy * HISTOGRAM_BINS / 100), 0), HISTOGRAM_BINS - 1)
+
+class QuizLeaderboard:
+    """
+    Incrementally maintained ranking data for a single quiz
+
+    Keeps a min-heap of the best LEADERBOARD_SIZE attempts and a fixed-bin
+    accuracy histogram, so ranking a new attempt never touches the scores table.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE):
+        self.size = size
+        self.histogram = [0] * HISTOGRAM_BINS
+        self.total = 0
+        # Heap entries: (accuracy, -score_id, entry); the root is the weakest kept attempt
+        self._heap = []
+
+    def add(self, score_id, accuracy, total_score, user_name):
+        """Record one attempt in O(log k)"""
+        self.histogram[accuracy_bin(accuracy)] += 1
+        self.total += 1
+        self.offer(score_id, accuracy, total_score, user_name)
+
+    def offer(self, score_id, accuracy, total_score, user_name):
+        """Consider an attempt for the top entries without counting it in the histogram"""
+        entry = {
+            'score_id': score_id,
+            'user': user_name,
+            'score': total_score,
+            'accuracy': round(accuracy, 2)
+        }
+        item = (accuracy, -score_id, entry)
+
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def top(self):
+        """Return the leaderboard, best attempt first, in O(k log k)"""
+        return [entry for _, _, entry in sorted(self._heap, key=lambda x: x[:2], reverse=True)]
+
+    def percentile(self, accuracy):
+        """Percentage of attempts in lower accuracy bins than the given accuracy"""
+        if not self.total:
+            return 0
+        below = sum(self.histogram[:accuracy_bin(accuracy)])
+        return round(below / self.total * 100, 2)
+
+_leaderboards = {}
+_lock = threading.Lock()
+
+def _cached(quiz_id):
+    # Caller holds _lock
+    cached = _leaderboards.get(quiz_id)
+    if cached is not None and time.monotonic() - cached[1] < LEADERBOARD_TTL:
+        return cached[0]
+    return None
+
+def _load_shard(quiz_id, size):
+    # Archived scores still count towards the ranking
+    scores = union_all(*(
+        select(table.id, table.accuracy_percentage, table.total_score, table.user_id)
+        .where(table.quiz_id == quiz_id)
+        for table in (Score, ScoreArchive)
+    )).subquery()
+
+    bin_expr = case(
+        (scores.c.accuracy_percentage >= 100, HISTOGRAM_BINS - 1),
+        (scores.c.accuracy_percentage < 0, 0),
+        else_=cast(scores.c.accuracy_percentage * HISTOGRAM_BINS / 100, Integer)
+    )
+    rows = db.session.query(bin_expr, func.count()).group_by(bin_expr).all()
+
+    top_rows = db.session.query(
+        scores.c.id, scores.c.accuracy_percentage, scores.c.total_score, User.full_name
+    ).join(User, scores.c.user_id == User.id) \
+     .order_by(scores.c.accuracy_percentage.desc(), scores.c.id.asc()).limit(size).all()
+
+    return rows, top_rows
+
+def _load_leaderboard(quiz_id):
+    """Seed a leaderboard from the database with two aggregate queries per shard"""
+    board = QuizLeaderboard()
+
+    for rows, top_rows in scatter(lambda: _load_shard(quiz_id, board.size)):
+        for bin_index, count in rows:
+            board.histogram[bin_index] += count
+            board.total += count
+
+        for score_id, accuracy, total_score, user_name in top_rows:
+            board.offer(score_id, accuracy, total_score, user_name)
+
+    return board
+
+def get_leaderboard(quiz_id):
+    """Return the leaderboard for a quiz, loading it on first use and once per LEADERBOARD_TTL"""
+    with _lock:
+        board = _cached(quiz_id)
+        if board is None:
+            board = _load_leaderboard(quiz_id)
+            _leaderboards[quiz_id] = (board, time.monotonic())
+        return board
+
+def record_score(score, user_name):
+    """Fold a newly committed Score into its quiz leaderboard"""
+    with _lock:
+        board = _cached(score.quiz_id)
+        if board is None:
+            # A fresh load already sees the committed score
+            _leaderboards[score.quiz_id] = (_load_leaderboard(score.quiz_id), time.monotonic())
+            return
+        board.add(score.id, score.accuracy_percentage, score.total_score, user_name)
+
+def invalidate_leaderboard(quiz_id=None):
+    """Drop cached leaderboards (all of them when quiz_id is None)"""
+    with _lock:
+        if quiz_id is None:
+            _leaderboards.clear()
+        else:
+            _leaderboards.pop(quiz_id, None)
@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import func, select
+
+from models import db, Quiz, Question, Score
+from utils.fragments import cached_fragment, bump_version, quiz_namespace, QUIZZES
+from utils.leaderboard import get_leaderboard
+from utils.read_models import get_quiz_view, get_quiz_questions
+from utils.scheduler import PeriodicWorker
+
+# Quizzes dated within this many days are warmed ahead of time
+WARM_LOOKAHEAD_DAYS = 1
+
+# Seconds between warmer runs
+WARM_INTERVAL = 15 * 60
+
+# Seconds before cached quiz content is reloaded, so edits made in another
+# worker show up here too
+CONTENT_TTL = 300
+
+# Everything take_quiz needs for one quiz; grading reads the answer key from
+# the database, since edits made in another worker reach this cache late
+QuizContent = namedtuple('QuizContent', ['quiz', 'questions'])
+
+_contents = {}
+_first_requests = set()
+_lock = threading.Lock()
+
+def _load_content(quiz_id):
+    quiz = get_quiz_view(quiz_id)
+    if quiz is None:
+        return None
+    return QuizContent(quiz, get_quiz_questions(quiz_id))
+
+def _fresh(cached):
+    return cached is not None and time.monotonic() - cached[1] < CONTENT_TTL
+
+def refresh_quiz_content(quiz_id):
+    """
+    Reload a quiz into the cache from the database
+
+    The quiz's fragments are invalidated only if its content actually changed.
+
+    Returns:
+        QuizContent, or None if the quiz does not exist
+    """
+    content = _load_content(quiz_id)
+    with _lock:
+        cached = _contents.pop(quiz_id, None)
+        if content is not None:
+            _contents[quiz_id] = (content, time.monotonic())
+    if cached is not None and cached[0] != content:
+        bump_version(quiz_namespace(quiz_id))
+    return content
+
+def get_quiz_content(quiz_id):
+    """
+    Cached quiz header and questions, reloaded once per CONTENT_TTL
+
+    Args:
+        quiz_id: Quiz to load
+
+    Returns:
+        QuizContent, or None if the quiz does not exist
+    """
+    with _lock:
+        cached = _contents.get(quiz_id)
+    if _fresh(cached):
+        return cached[0]
+    return refresh_quiz_content(quiz_id)
+
+def get_questions_html(quiz_id, questions):
+    """
+    Rendered question list for take_quiz
+
+    The list is identical for every student (saved answers are restored in
+    the browser), so it is rendered once per version of the quiz.
+    """
+    return cached_fragment('quiz_questions.html', (QUIZZES, quiz_namespace(quiz_id)),
+                           lambda: {'questions': questions}, key=quiz_id)
+
+def is_warm(quiz_id):
+    """Whether a quiz is in the cache and not yet due for a reload"""
+    with _lock:
+        return _fresh(_contents.get(quiz_id))
+
+def invalidate_quiz_content(quiz_id=None):
+    """Drop cached quiz content and fragments (all quizzes when quiz_id is None)"""
+    with _lock:
+        if quiz_id is None:
+            _contents.clear()
+        else:
+            _contents.pop(quiz_id, None)
+    bump_version(QUIZZES if quiz_id is None else quiz_namespace(quiz_id))
+
+def record_first_request(quiz_id, seconds, warmed):
+    """Log how long the first take_quiz request for a quiz took in this process"""
+    with _lock:
+        if quiz_id in _first_requests:
+            return
+        _first_requests.add(quiz_id)
+    current_app.logger.info('First take_quiz request for quiz %s: %.1fms (%s)',
+                            quiz_id, seconds * 1e3, 'warmed' if warmed else 'cold')
+
+def touch_quiz_pages(quiz_id):
+    """
+    Read the table and index pages the quiz will hit into SQLite's page cache
+
+    Question rows are read in full (including the text columns the cached
+    views do not need), and the quiz's slice of the scores index is scanned.
+    """
+    db.session.execute(
+        select(func.count(Question.id), func.sum(func.length(Question.question_statement)
+                                                 + func.length(Question.option1) + func.length(Question.option2)
+                                                 + func.length(Question.option3) + func.length(Question.option4)))
+        .where(Question.quiz_id == quiz_id)
+    ).one()
+    db.session.execute(
+        select(func.count(Score.id), func.max(Score.accuracy_percentage)).where(Score.quiz_id == quiz_id)
+    ).one()
+
+def warm_quiz(quiz_id):
+    """
+    Preload one quiz into the application caches
+
+    The quiz is always reloaded from the database, but its rendered fragments
+    are only dropped if the content changed since it was last cached.
+
+    Returns:
+        (cold_seconds, warm_seconds): time to load the quiz from the database,
+        and time to serve it from the cache afterwards
+    """
+    start = time.perf_counter()
+    touch_quiz_pages(quiz_id)
+    content = refresh_quiz_content(quiz_id)
+    if content is not None:
+        get_questions_html(quiz_id, content.questions)
+    get_leaderboard(quiz_id)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    content = get_quiz_content(quiz_id)
+    if content is not None:
+        get_questions_html(quiz_id, content.questions)
+    warm = time.perf_counter() - start
+    return cold, warm
+
+def upcoming_quiz_ids(today=None, days=WARM_LOOKAHEAD_DAYS):
+    """Ids of quizzes dated from today through today + days"""
+    today = today or date.today()
+    return list(db.session.scalars(
+        select(Quiz.id)
+        .where(Quiz.date_of_quiz >= today, Quiz.date_of_quiz <= today + timedelta(days=days))
+        .order_by(Quiz.date_of_quiz, Quiz.id)
+    ))
+
+def warm_upcoming_quizzes(today=None, days=WARM_LOOKAHEAD_DAYS, force=False):
+    """
+    Warm every upcoming quiz not already in the cache
+
+    Returns:
+        List of (quiz_id, cold_seconds, warm_seconds)
+    """
+    results = []
+    for quiz_id in upcoming_quiz_ids(today, days):
+        if force or not is_warm(quiz_id):
+            results.append((quiz_id, *warm_quiz(quiz_id)))
+    return results
+
+def start_warm_worker(app, interval=WARM_INTERVAL):
+    """Warm upcoming quizzes now, then re-check every interval seconds"""
+    def tick():
+        with app.app_context():
+            warm_upcoming_quizzes()
+
+    worker = PeriodicWorker(interval, tick, name='quiz-cache-warmer')
+    worker.start()
+    # First run right away rather than after a full interval
+    threading.Thread(target=tick, name='quiz-cache-warmer-initial', daemon=True).start()
+    return worker
@@ -0,0 +1,105 @@
+from collections import namedtuple
+from sqlalchemy import func, select
+
+from models import db, Subject, Chapter, Quiz, Question, QuestionOutcome, QuizAttempt, Score
+from utils.sharding import account_partitions, scatter, shard_for_id, use_shard
+
+# Column-only views for read-only pages. Rows are loaded straight into these
+# tuples, skipping ORM identity mapping, change tracking and lazy relationships.
+
+QuizView = namedtuple('QuizView', [
+    'id', 'chapter_id', 'chapter_name', 'subject_name', 'date_of_quiz', 'time_duration', 'remarks'
+])
+
+QuestionView = namedtuple('QuestionView', [
+    'id', 'question_statement', 'option1', 'option2', 'option3', 'option4'
+])
+
+ScoreView = namedtuple('ScoreView', [
+    'id', 'quiz_id', 'user_id', 'chapter_id', 'chapter_name', 'subject_name', 'date_of_quiz',
+    'timestamp_of_attempt', 'total_score', 'accuracy_percentage', 'total_questions'
+])
+
+SubjectCardView = namedtuple('SubjectCardView', ['id', 'name', 'description', 'chapter_count'])
+
+def _fetch(view, statement):
+    return [view._make(row) for row in db.session.execute(statement)]
+
+def get_quiz_view(quiz_id):
+    """Quiz header with chapter and subject names, or None"""
+    statement = select(
+        Quiz.id, Quiz.chapter_id, Chapter.name, Subject.name,
+        Quiz.date_of_quiz, Quiz.time_duration, Quiz.remarks
+    ).join(Chapter, Quiz.chapter_id == Chapter.id) \
+     .join(Subject, Chapter.subject_id == Subject.id) \
+     .where(Quiz.id == quiz_id)
+    rows = _fetch(QuizView, statement)
+    return rows[0] if rows else None
+
+def get_quiz_questions(quiz_id):
+    """Questions as shown to students (without the answer key)"""
+    statement = select(
+        Question.id, Question.question_statement,
+        Question.option1, Question.option2, Question.option3, Question.option4
+    ).where(Question.quiz_id == quiz_id).order_by(Question.id)
+    return _fetch(QuestionView, statement)
+
+def get_question_view(question_id):
+    """A single question as shown to students, or None"""
+    statement = select(
+        Question.id, Question.question_statement,
+        Question.option1, Question.option2, Question.option3, Question.option4
+    ).where(Question.id == question_id)
+    rows = _fetch(QuestionView, statement)
+    return rows[0] if rows else None
+
+def get_answer_key(quiz_id):
+    """Map of question id to correct option for grading"""
+    statement = select(Question.id, Question.correct_option).where(Question.quiz_id == quiz_id)
+    return dict(db.session.execute(statement).all())
+
+def _score_statement():
+    quiz_questions = select(func.count(Question.id)) \
+        .where(Question.quiz_id == Score.quiz_id) \
+        .scalar_subquery()
+    # Adaptive attempts are graded on the questions they were served
+    served_questions = select(func.count(QuestionOutcome.id)) \
+        .join(QuizAttempt, QuestionOutcome.attempt_id == QuizAttempt.id) \
+        .where(QuizAttempt.score_id == Score.id) \
+        .scalar_subquery()
+    total_questions = func.coalesce(func.nullif(served_questions, 0), quiz_questions)
+
+    return select(
+        Score.id, Score.quiz_id, Score.user_id, Quiz.chapter_id, Chapter.name, Subject.name,
+        Quiz.date_of_quiz, Score.timestamp_of_attempt, Score.total_score,
+        Score.accuracy_percentage, total_questions
+    ).join(Quiz, Score.quiz_id == Quiz.id) \
+     .join(Chapter, Quiz.chapter_id == Chapter.id) \
+     .join(Subject, Chapter.subject_id == Subject.id)
+
+def get_score_view(score_id):
+    """A single attempt with its quiz details, or None"""
+    # The id says which partition allocated it, so scores made before
+    # sharding was enabled are still found on the primary
+    with use_shard(shard_for_id(score_id)):
+        rows = _fetch(ScoreView, _score_statement().where(Score.id == score_id))
+    return rows[0] if rows else None
+
+def get_recent_scores(user_id, limit=5):
+    """A user's latest attempts, newest first"""
+    statement = _score_statement() \
+        .where(Score.user_id == user_id) \
+        .order_by(Score.timestamp_of_attempt.desc()) \
+        .limit(limit)
+    rows = [row for rows in scatter(lambda: _fetch(ScoreView, statement), account_partitions(user_id))
+            for row in rows]
+    rows.sort(key=lambda score: score.timestamp_of_attempt, reverse=True)
+    return rows[:limit]
+
+def get_subject_cards():
+    """Subjects with their chapter counts"""
+    chapter_count = select(func.count(Chapter.id)) \
+        .where(Chapter.subject_id == Subject.id) \
+        .scalar_subquery()
+    statement = select(Subject.id, Subject.name, Subject.description, chapter_count).order_by(Subject.id)
+    return _fetch(SubjectCardView, statement)
@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from sqlalchemy import event, select
+
+from models import db, ReplicaHeartbeat, RoutingSession, REPLICA_BIND
+from utils.scheduler import PeriodicWorker
+
+# Seconds a replica may trail the primary before reads fall back to the primary.
+# Also how long a user's reads stay on the primary after they write something.
+DEFAULT_MAX_LAG = 5.0
+
+# Seconds between heartbeat writes on the primary, and between lag checks
+HEARTBEAT_INTERVAL = 1.0
+LAG_CHECK_INTERVAL = 1.0
+
+_lag = {'checked_at': 0.0, 'seconds': None}
+_lag_lock = threading.Lock()
+
+def configure_replica(app):
+    """
+    Register the replica engine from REPLICA_DATABASE_URI, if set
+
+    Must run before db.init_app(app).
+    """
+    uri = app.config.get('REPLICA_DATABASE_URI')
+    if uri:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = uri
+
+def replica_configured():
+    return REPLICA_BIND in db.engines
+
+def _measure_lag():
+    try:
+        with db.engines[REPLICA_BIND].connect() as connection:
+            beat_at = connection.execute(select(ReplicaHeartbeat.beat_at)).scalar()
+    except Exception:
+        # Unreachable replica, or one that has not received the schema yet
+        return None
+    if beat_at is None:
+        return None
+    return (datetime.now() - beat_at).total_seconds()
+
+def replica_lag():
+    """Seconds the replica trails the primary (None if unknown), checked at most every LAG_CHECK_INTERVAL"""
+    now = time.monotonic()
+    with _lag_lock:
+        if now - _lag['checked_at'] < LAG_CHECK_INTERVAL:
+            return _lag['seconds']
+    seconds = _measure_lag()
+    with _lag_lock:
+        _lag['checked_at'], _lag['seconds'] = now, seconds
+    return seconds
+
+def can_read_from_replica():
+    """Whether the current request's reads may go to the replica"""
+    if not replica_configured():
+        return False
+    max_lag = current_app.config.get('REPLICA_MAX_LAG', DEFAULT_MAX_LAG)
+    # Read-your-own-writes: stay on the primary until the replica must have caught up
+    last_write = session.get('last_write_at')
+    if last_write and time.time() - last_write < max_lag:
+        return False
+    lag = replica_lag()
+    return lag is not None and lag <= max_lag
+
+def replica_reads(f):
+    """Route a read-only view's queries to the replica when it is fresh enough"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_replica = can_read_from_replica()
+        return f(*args, **kwargs)
+    return decorated_function
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _note_write(db_session):
+    if has_request_context():
+        g.wrote = True
+
+def remember_writes(response):
+    """after_request hook: start the user's read-your-own-writes window"""
+    if g.get('wrote') and replica_configured():
+        session['last_write_at'] = time.time()
+    return response
+
+def write_heartbeat():
+    db.session.merge(ReplicaHeartbeat(id=1, beat_at=datetime.now()))
+    db.session.commit()
+
+def copy_to_replica():
+    """Refresh a local SQLite replica with an online backup of the primary (for testing)"""
+    primary = db.engines[None].raw_connection()
+    replica = db.engines[REPLICA_BIND].raw_connection()
+    try:
+        primary.driver_connection.backup(replica.driver_connection)
+    finally:
+        replica.close()
+        primary.close()
+
+def start_replication(app):
+    """
+    Keep the primary's heartbeat fresh, and with REPLICA_SYNC_INTERVAL set,
+    copy the primary into a local SQLite replica on that interval
+    """
+    with app.app_context():
+        if not replica_configured():
+            return None
+
+    sync_interval = app.config.get('REPLICA_SYNC_INTERVAL')
+
+    def tick():
+        with app.app_context():
+            write_heartbeat()
+            if sync_interval:
+                copy_to_replica()
+
+    worker = PeriodicWorker(sync_interval or HEARTBEAT_INTERVAL, tick, name='replica-heartbeat')
+    worker.start()
+    return worker
@@ -0,0 +1,73 @@
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class DeadlineScheduler:
+    """
+    Min-heap of (deadline, key) pairs
+
+    Scheduling is O(log n). Cancelling is O(1): cancelled or rescheduled keys are
+    skipped lazily when they reach the top of the heap, so a tick only touches
+    the entries that are actually due.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, deadline):
+        with self._lock:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+
+    def cancel(self, key):
+        with self._lock:
+            self._deadlines.pop(key, None)
+
+    def load(self, entries):
+        """Replace the schedule with (key, deadline) pairs in O(n)"""
+        with self._lock:
+            self._deadlines = dict(entries)
+            self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def pop_due(self, now, limit=None):
+        """Remove and return up to limit keys whose deadline is at or before now"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+                deadline, key = heapq.heappop(self._heap)
+                # Skip cancelled keys and stale entries left behind by rescheduling
+                if self._deadlines.get(key) == deadline:
+                    del self._deadlines[key]
+                    due.append(key)
+            # Drop stale entries eagerly once they dominate the heap
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [(d, k) for k, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        return due
+
+class PeriodicWorker(threading.Thread):
+    """Daemon thread calling func every interval seconds until stopped"""
+
+    def __init__(self, interval, func, name=None):
+        super().__init__(name=name, daemon=True)
+        self.interval = interval
+        self.func = func
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.func()
+            except Exception:  # keep ticking; one bad batch must not stop the worker
+                logger.exception('%s failed', self.name)
+
+    def stop(self):
+        self._stopped.set()
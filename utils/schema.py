@@ -0,0 +1,103 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+def upgrade_schema(db):
+    """
+    Bring an existing SQLite database in line with the models
+
+    db.create_all() only creates missing tables, so databases created by older
+    versions of the app keep their original columns, foreign keys and indexes.
+    This rebuilds tables whose ON DELETE rules differ from the models, adds
+    missing nullable columns and creates any missing indexes.
+
+    Args:
+        db: Flask-SQLAlchemy instance bound to the current app
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    _rebuild_foreign_keys(engine, db.metadata)
+    _add_missing_columns(engine, db.metadata)
+    _create_missing_indexes(engine, db.metadata)
+
+def _ondelete_rules(connection, table_name):
+    rows = connection.exec_driver_sql(f'PRAGMA foreign_key_list("{table_name}")').fetchall()
+    # Columns: id, seq, table, from, to, on_update, on_delete, match
+    return {(row[3], row[2]): (row[6] or 'NO ACTION').upper() for row in rows}
+
+def _expected_ondelete_rules(table):
+    return {
+        (fk.parent.name, fk.column.table.name): (fk.ondelete or 'NO ACTION').upper()
+        for fk in table.foreign_keys
+    }
+
+def _rebuild_foreign_keys(engine, metadata):
+    existing_tables = set(inspect(engine).get_table_names())
+
+    with engine.connect() as connection:
+        stale = [
+            table for table in metadata.sorted_tables
+            if table.name in existing_tables
+            and _ondelete_rules(connection, table.name) != _expected_ondelete_rules(table)
+        ]
+        if not stale:
+            return
+
+        # Table rebuilds follow https://sqlite.org/lang_altertable.html#otheralter
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        connection.commit()
+
+        # Scratch copy of the schema so the rebuilt tables can resolve their foreign keys
+        scratch = type(metadata)()
+        for table in metadata.sorted_tables:
+            table.to_metadata(scratch)
+
+        try:
+            for table in stale:
+                old_columns = {c['name'] for c in inspect(connection).get_columns(table.name)}
+                columns = ', '.join(f'"{c.name}"' for c in table.columns if c.name in old_columns)
+                new_table = table.to_metadata(scratch, name=f'_new_{table.name}')
+                new_table.indexes.clear()
+
+                connection.exec_driver_sql(f'DROP TABLE IF EXISTS "{new_table.name}"')
+                connection.execute(CreateTable(new_table))
+                connection.exec_driver_sql(
+                    f'INSERT INTO "{new_table.name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+                )
+                connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+                connection.exec_driver_sql(f'ALTER TABLE "{new_table.name}" RENAME TO "{table.name}"')
+
+            violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+            if violations:
+                raise RuntimeError(f'Foreign key violations after schema upgrade: {violations[:5]}')
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+            connection.commit()
+
+def _add_missing_columns(engine, metadata):
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                # SQLite can only add columns that may be NULL for existing rows;
+                # uniqueness comes from the column's index, created afterwards
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}')
+
+def _create_missing_indexes(engine, metadata):
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
@@ -0,0 +1,150 @@
+import re
+from sqlalchemy import text, or_, and_
+from sqlalchemy.exc import OperationalError
+
+from models import db, Question
+
+# Results returned per page by the question search
+SEARCH_PAGE_SIZE = 20
+
+# Shortest final term that is prefix-matched while the admin is still typing
+MIN_PREFIX_LENGTH = 3
+
+# bm25 weights for question_statement, option1..option4
+SEARCH_COLUMN_WEIGHTS = (3.0, 1.0, 1.0, 1.0, 1.0)
+
+_SEARCH_COLUMNS = ('question_statement', 'option1', 'option2', 'option3', 'option4')
+
+# Whether the FTS5 index is available; set by ensure_search_index
+fts_enabled = False
+
+def ensure_search_index(db):
+    """
+    Create the FTS5 index over questions and the triggers keeping it in sync
+
+    Falls back to LIKE queries when the SQLite build lacks FTS5. Triggers fire on
+    every insert, update and delete (including ON DELETE CASCADE), so routes do
+    not have to maintain the index themselves.
+
+    Args:
+        db: Flask-SQLAlchemy instance bound to the current app
+    """
+    global fts_enabled
+    fts_enabled = False
+
+    if db.engine.dialect.name != 'sqlite':
+        return
+
+    columns = ', '.join(_SEARCH_COLUMNS)
+    new_columns = ', '.join(f'new.{c}' for c in _SEARCH_COLUMNS)
+    old_columns = ', '.join(f'old.{c}' for c in _SEARCH_COLUMNS)
+
+    with db.engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'question_search'"
+        ).first()
+
+        if not exists:
+            try:
+                connection.exec_driver_sql(
+                    f"CREATE VIRTUAL TABLE question_search USING fts5("
+                    f"{columns}, content='questions', content_rowid='id', tokenize='porter unicode61', prefix='3')"
+                )
+            except OperationalError:
+                return
+
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS questions_search_insert AFTER INSERT ON questions BEGIN
+                INSERT INTO question_search(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+        """)
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS questions_search_delete AFTER DELETE ON questions BEGIN
+                INSERT INTO question_search(question_search, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+            END
+        """)
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS questions_search_update AFTER UPDATE ON questions BEGIN
+                INSERT INTO question_search(question_search, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                INSERT INTO question_search(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+        """)
+
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO question_search(question_search) VALUES ('rebuild')")
+
+    fts_enabled = True
+
+def _search_terms(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+def _fts_query(terms):
+    # Quote each term so user input is never parsed as FTS syntax; prefix-match the last one
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _result(row, rank=None):
+    return {
+        'id': row.id,
+        'quiz_id': row.quiz_id,
+        'question': row.question_statement,
+        'options': [row.option1, row.option2, row.option3, row.option4],
+        'correct': row.correct_option,
+        'rank': round(rank, 4) if rank is not None else None
+    }
+
+def search_questions(query, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Full-text search over question statements and options
+
+    Args:
+        query: Free text entered by the admin
+        page: 1-based page number
+        per_page: Results per page
+
+    Returns:
+        Dictionary with ranked results and pagination details
+    """
+    page = max(page, 1)
+    terms = _search_terms(query)
+    response = {'query': query or '', 'page': page, 'per_page': per_page, 'total': 0, 'results': []}
+
+    if not terms:
+        return response
+
+    offset = (page - 1) * per_page
+
+    if fts_enabled:
+        match = _fts_query(terms)
+        weights = ', '.join(str(w) for w in SEARCH_COLUMN_WEIGHTS)
+
+        response['total'] = db.session.execute(
+            text("SELECT count(*) FROM question_search WHERE question_search MATCH :match"),
+            {'match': match}
+        ).scalar()
+
+        rows = db.session.execute(text(f"""
+            SELECT q.id, q.quiz_id, q.question_statement, q.option1, q.option2, q.option3, q.option4,
+                   q.correct_option, bm25(question_search, {weights}) AS rank
+            FROM question_search
+            JOIN questions q ON q.id = question_search.rowid
+            WHERE question_search MATCH :match
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """), {'match': match, 'limit': per_page, 'offset': offset}).all()
+
+        response['results'] = [_result(row, row.rank) for row in rows]
+        return response
+
+    # Fallback: every term must appear in the statement or one of the options
+    conditions = and_(*[
+        or_(*[getattr(Question, column).ilike(f'%{term}%') for column in _SEARCH_COLUMNS])
+        for term in terms
+    ])
+    base = Question.query.filter(conditions)
+    response['total'] = base.count()
+    rows = base.order_by(Question.id.desc()).offset(offset).limit(per_page).all()
+    response['results'] = [_result(row) for row in rows]
+    return response
@@ -0,0 +1,229 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, session
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import db, current_shard, RoutingSession, User
+
+# Users per shard: ids 1..SHARD_USER_RANGE go to shard0, the next range to
+# shard1, and so on (the last shard also takes every id beyond its range)
+DEFAULT_SHARD_USER_RANGE = 10000
+
+# Each shard allocates attempt and score ids from its own block, so ids stay
+# unique across shards and identify the shard that holds the row
+SHARD_ID_SPAN = 10 ** 12
+SHARDED_SEQUENCES = ('scores', 'quiz_attempts')
+
+# Tables copied from the primary to every shard so foreign keys and joins
+# work locally; parents before children
+REFERENCE_TABLES = ('users', 'subjects', 'chapters', 'quizzes', 'questions')
+
+# Ids per IN (...) when copying rows, well under SQLite's bound-parameter limit
+SYNC_BATCH_SIZE = 500
+
+def configure_shards(app):
+    """
+    Register shard engines from SHARD_DATABASE_URIS, if set
+
+    Must run before db.init_app(app).
+    """
+    for index, uri in enumerate(app.config.get('SHARD_DATABASE_URIS') or ()):
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[f'shard{index}'] = uri
+
+def shard_keys():
+    return [f'shard{index}' for index in range(len(current_app.config.get('SHARD_DATABASE_URIS') or ()))]
+
+def sharding_enabled():
+    return bool(current_app.config.get('SHARD_DATABASE_URIS'))
+
+def shard_for_user(user_id):
+    """Bind key of the shard holding a user's attempts, or None when not sharded"""
+    keys = shard_keys()
+    if not keys:
+        return None
+    user_range = current_app.config.get('SHARD_USER_RANGE', DEFAULT_SHARD_USER_RANGE)
+    return keys[min((user_id - 1) // user_range, len(keys) - 1)]
+
+def shard_for_account(user_id):
+    """Like shard_for_user, but admins' attempts stay on the primary"""
+    if not sharding_enabled():
+        return None
+    with use_shard(None):
+        user = db.session.get(User, user_id)
+    return None if user is None or user.is_admin else shard_for_user(user_id)
+
+def shard_for_id(record_id):
+    """Bind key of the shard an attempt or score id was allocated by, or None for the primary"""
+    index = record_id // SHARD_ID_SPAN - 1
+    keys = shard_keys()
+    return keys[index] if 0 <= index < len(keys) else None
+
+@contextmanager
+def use_shard(key):
+    """Send every query in the block to one shard (None means the primary)"""
+    token = current_shard.set(key)
+    try:
+        yield
+    finally:
+        current_shard.reset(token)
+
+def partitions():
+    """
+    Where attempt data lives: the primary, then every shard
+
+    The primary keeps attempts made before sharding was enabled and those of
+    admins, who are never pinned to a shard.
+    """
+    return [None] + shard_keys()
+
+def account_partitions(user_id):
+    """
+    Where one user's attempt data can live: the primary, which keeps attempts
+    made before sharding was enabled, then the user's own shard
+    """
+    shard = shard_for_account(user_id)
+    return [None] if shard is None else [None, shard]
+
+def scatter(query, keys=None):
+    """Run query() against every partition (or just keys) and return the list of results"""
+    results = []
+    for key in partitions() if keys is None else keys:
+        with use_shard(key):
+            results.append(query())
+    return results
+
+def group_by_shard(record_ids):
+    """Split attempt or score ids by the partition that holds them"""
+    groups = defaultdict(list)
+    for record_id in record_ids:
+        groups[shard_for_id(record_id)].append(record_id)
+    return groups
+
+def _copy_rows(shard_engine, table, rows):
+    if not rows:
+        return
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={column.name: statement.excluded[column.name] for column in table.columns if column.name != 'id'}
+    )
+    with shard_engine.begin() as connection:
+        connection.execute(statement, rows)
+
+def _delete_rows(shard_engine, table, ids):
+    if not ids:
+        return
+    with shard_engine.begin() as connection:
+        connection.execute(delete(table).where(table.c.id.in_(ids)))
+
+def _primary_rows(changed):
+    """Read the given reference rows from the primary; None as the ids means the whole table"""
+    tables = db.metadata.tables
+    rows = defaultdict(list)
+    with db.engines[None].connect() as connection:
+        for name, ids in changed.items():
+            table = tables[name]
+            if ids is None:
+                batches = [select(table)]
+            else:
+                ids = sorted(ids)
+                batches = [select(table).where(table.c.id.in_(ids[start:start + SYNC_BATCH_SIZE]))
+                           for start in range(0, len(ids), SYNC_BATCH_SIZE)]
+            for statement in batches:
+                rows[name].extend(dict(row._mapping) for row in connection.execute(statement))
+    return rows
+
+def sync_reference_rows(changed, deleted, keys=None):
+    """
+    Copy changed reference rows from the primary to every shard
+
+    Args:
+        changed: Dict of table name to ids inserted or updated on the primary
+            (None copies the whole table)
+        deleted: Dict of table name to ids deleted on the primary
+        keys: Shards to update (defaults to all of them)
+    """
+    tables = db.metadata.tables
+    rows = _primary_rows({name: ids for name, ids in changed.items() if ids is None or ids})
+    for key in shard_keys() if keys is None else keys:
+        engine = db.engines[key]
+        # Children first, so ON DELETE CASCADE also clears the shard's attempts
+        for name in reversed(REFERENCE_TABLES):
+            _delete_rows(engine, tables[name], list(deleted.get(name, ())))
+        for name in REFERENCE_TABLES:
+            _copy_rows(engine, tables[name], rows.get(name))
+
+def _table_ids(engine):
+    tables = db.metadata.tables
+    with engine.connect() as connection:
+        return {name: set(connection.execute(select(tables[name].c.id)).scalars()) for name in REFERENCE_TABLES}
+
+def sync_reference_data(full=False):
+    """
+    Bring every shard's reference tables in line with the primary's
+
+    Only ids are compared: rows missing from a shard are copied and rows gone
+    from the primary are deleted. Edits made while serving are already copied
+    at the end of each request; full=True recopies every row, for edits made
+    to the primary some other way (e.g. while sharding was switched off).
+
+    Returns:
+        Number of rows copied or deleted across all shards
+    """
+    primary_ids = _table_ids(db.engines[None])
+    synced = 0
+    for key in shard_keys():
+        shard_ids = _table_ids(db.engines[key])
+        changed = {name: None if full else primary_ids[name] - shard_ids[name] for name in REFERENCE_TABLES}
+        deleted = {name: shard_ids[name] - primary_ids[name] for name in REFERENCE_TABLES}
+        sync_reference_rows(changed, deleted, [key])
+        synced += sum(len(primary_ids[name] if ids is None else ids) for name, ids in changed.items())
+        synced += sum(len(ids) for ids in deleted.values())
+    return synced
+
+def init_shards():
+    """Create shard schemas, seed their id blocks and copy the reference tables"""
+    if not sharding_enabled():
+        return
+    for index, key in enumerate(shard_keys()):
+        engine = db.engines[key]
+        db.metadata.create_all(engine)
+        with engine.begin() as connection:
+            for name in SHARDED_SEQUENCES:
+                exists = connection.exec_driver_sql(
+                    'SELECT 1 FROM sqlite_sequence WHERE name = ?', (name,)).first()
+                if not exists:
+                    connection.exec_driver_sql(
+                        'INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                        (name, (index + 1) * SHARD_ID_SPAN))
+    sync_reference_data()
+
+def pin_request_to_shard():
+    """before_request hook: send a signed-in student's queries to their shard"""
+    if sharding_enabled() and 'user_id' in session and not session.get('is_admin'):
+        g.shard_token = current_shard.set(shard_for_user(session['user_id']))
+
+def unpin_request(exc=None):
+    token = g.pop('shard_token', None)
+    if token is not None:
+        current_shard.reset(token)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_reference_changes(db_session, flush_context):
+    # Only primary writes made while serving a request need copying
+    if not has_request_context() or current_shard.get() is not None or not sharding_enabled():
+        return
+    for instances, bucket in ((db_session.new, 'reference_changed'), (db_session.dirty, 'reference_changed'),
+                              (db_session.deleted, 'reference_deleted')):
+        for instance in instances:
+            name = getattr(instance, '__tablename__', None)
+            if name in REFERENCE_TABLES:
+                g.setdefault(bucket, defaultdict(set))[name].add(instance.id)
+
+def sync_after_request(response):
+    """after_request hook: push the request's reference-table writes to the shards"""
+    changed, deleted = g.pop('reference_changed', None), g.pop('reference_deleted', None)
+    if (changed or deleted) and sharding_enabled():
+        sync_reference_rows(changed or {}, deleted or {})
+    return response